@@ -0,0 +1,86 @@
+# Counters of the work done by each axiom while generating the instance graph (see GraphGen),
+# by depth: to see which axioms of a corpus make a graph blow up.
+#
+# For each axiom and depth:
+#   calls      profiles the axiom was asked to generate instances for
+#   time       seconds spent generating them (through the cache, if any)
+#   instances  instances generated (each instance counted once per call)
+#   new        instances that were not in the graph yet (the rest are duplicates)
+#   profiles   for interprofile axioms: profiles reached that were neither explored nor
+#              reached yet (newProfiles), or that were (seenProfiles)
+
+from collections import defaultdict
+from time import perf_counter
+
+class AxiomStats():
+
+    FIELDS = ('calls', 'time', 'instances', 'new', 'newProfiles', 'seenProfiles')
+
+    def __init__(self):
+        # (axiom name, depth) ---> counters
+        self._counters = defaultdict(self._zero)
+
+    @classmethod
+    def _zero(cls):
+        return dict.fromkeys(cls.FIELDS, 0)
+
+    def add(self, axiom, depth, field, amount = 1):
+        self._counters[(axiom, depth)][field] += amount
+
+    # time and count a call of generate(*args) for the axiom (calls: how many profiles it covers).
+    # Returns what generate returns.
+    def timed(self, axiom, depth, calls, generate, *args):
+        start = perf_counter()
+        result = generate(*args)
+        counters = self._counters[(axiom, depth)]
+        counters['time'] += perf_counter() - start
+        counters['calls'] += calls
+        return result
+
+    # add the counters of other (e.g. of a worker process)
+    def merge(self, other):
+        for key, counters in other._counters.items():
+            for field, amount in counters.items():
+                self._counters[key][field] += amount
+
+    # the counters can be pickled (to be sent back by the worker processes)
+    def __getstate__(self):
+        return dict(self._counters)
+
+    def __setstate__(self, state):
+        self._counters = defaultdict(self._zero, state)
+
+    def report(self):
+        """ One record (a dict) per axiom and depth, sorted by depth and axiom, with the counters
+        (see above) plus the duplicates discarded (instances - new). """
+        records = []
+        for (axiom, depth), counters in sorted(self._counters.items(), key = lambda item: (item[0][1], item[0][0])):
+            record = {'axiom': axiom, 'depth': depth, **counters}
+            record['duplicates'] = counters['instances'] - counters['new']
+            records.append(record)
+        return records
+
+    def totals(self):
+        """ Same as report, summed over the depths: one record per axiom. """
+        totals = {}
+        for record in self.report():
+            total = totals.setdefault(record['axiom'], {'axiom': record['axiom']})
+            for field in self.FIELDS + ('duplicates',):
+                total[field] = total.get(field, 0) + record[field]
+        return sorted(totals.values(), key = lambda record: -record['time'])
+
+    def toString(self):
+        columns = ('calls', 'time', 'instances', 'new', 'duplicates', 'newProfiles', 'seenProfiles')
+        lines = [f"{'axiom':<24}{'depth':>6}" + ''.join(f'{column:>14}' for column in columns)]
+
+        def line(record, depth):
+            values = ''.join(f'{record[column]:>14.3f}' if column == 'time' else f'{record[column]:>14}' for column in columns)
+            return f"{record['axiom']:<24}{depth:>6}" + values
+
+        for record in self.report():
+            lines.append(line(record, record['depth']))
+        lines.append('')
+        for record in self.totals():
+            lines.append(line(record, 'all'))
+
+        return '\n'.join(lines)
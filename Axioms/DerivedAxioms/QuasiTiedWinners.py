@@ -1,5 +1,4 @@
 from Axioms.Utils.DerivedInstance import DerivedInstance
-from Profile import Profile
 from itertools import combinations
 
 class QuasiTiedWinners(DerivedInstance):
@@ -25,7 +24,7 @@ class QuasiTiedWinners(DerivedInstance):
             # if we have no clue who the winner is:
             if winner is None:
                 # if x >(majority)> y, then we hypothesise x is the winner
-                prefers_x = sum([count for ballot, count in profile.getTuples() if profile.prefers(ballot, x, y)])
+                prefers_x = profile.getSupport(x, y)
                 if prefers_x != (len(profile) / 2):
                     winner = x if prefers_x > (len(profile) / 2) else y
 
@@ -33,48 +32,19 @@ class QuasiTiedWinners(DerivedInstance):
             if winner is not None:
                 # if winner is neither x nor y, we want them to tie. If this not true, return None (no winner)
                 if winner != x and winner != y:
-                    prefers_x = sum([count for ballot, count in profile.getTuples() if profile.prefers(ballot, x, y)])
+                    prefers_x = profile.getSupport(x, y)
                     if prefers_x != (len(profile) / 2):
                         return None
                 else:
                     # if x = winner, loser = y, it must be the case that x wins. Otherwise, return None
                     loser = y if winner == x else x
-                    prefers_w = sum([count for ballot, count in profile.getTuples() if profile.prefers(ballot, winner, loser)])
+                    prefers_w = profile.getSupport(winner, loser)
                     if prefers_w < (len(profile) / 2):
                         return None
 
         # note that we could return None if we never found any winner.
         return winner
 
-    @classmethod
-    # axuiliary method to find cancellation profle 
-    # try systematically to lower alternative WINNER until we find a canc profile (if there is one!)
-    # note: only done if the above necessary conditions are true
-    def _tryLoweringAlt(cls, ballots, winner, soFar = []):
-        if not ballots:
-            pSoFar = Profile(soFar)
-            if pSoFar.isCancellation():
-                return pSoFar
-            else:
-                return None
-
-        reference, rest = ballots[0], ballots[1:]
-
-        while True:
-            prof = cls._tryLoweringAlt(rest, winner, soFar + [reference])
-            if prof is not None:
-                return prof
-
-            if reference.index(winner) == len(reference) - 1:
-                return None
-            else:
-                reference = list(reference)
-                rank = reference.index(winner)
-                reference[rank] = reference[rank + 1]
-                reference[rank + 1] = winner
-                reference = tuple(reference)
-
-
     @classmethod
     # find the base cancellation profile
     def _findCancProfile(cls, profile):
@@ -85,7 +55,12 @@ class QuasiTiedWinners(DerivedInstance):
             return None, None
         # found? return the profile and the alt
         else:
-            return cls._tryLoweringAlt(list(profile.allBallots()), winner), winner
+            return profile.findCancellationByShifting(winner, down = True), winner
+
+    # the instances only depend on the profile. Odd profiles are skipped right away (see below)
+    @classmethod
+    def cacheKey(cls, profile, goal, reachedBy = set()):
+        return () if len(profile) % 2 == 0 else None
 
     @classmethod
     def getInstancesAndProfiles(cls, profile, goal, reachedBy = set()):
@@ -40,6 +40,11 @@ class Symmetry(DerivedInstance):
 
         return clusters
 
+    # the instances only depend on the profile
+    @classmethod
+    def cacheKey(cls, profile, goal, reachedBy = set()):
+        return ()
+
     @classmethod
     def getInstancesAndProfiles(cls, profile, goal, reachedBy = set()):
 
@@ -14,6 +14,11 @@ class Neutrality(InterInstance):
         self._mapped = mapped
         self._mapping = mapping
 
+    # if the profile has been reached by neutrality, nothing is generated (see below): no need to cache
+    @classmethod
+    def cacheKey(cls, profile, goal, reachedBy = set()):
+        return None if 'Neutrality' in map(lambda a: a.axiomName(), reachedBy) else ()
+
     @classmethod
     def getInstancesAndProfiles(cls, profile, goal, reachedBy = set()):
 
@@ -66,6 +71,9 @@ class Neutrality(InterInstance):
         return \
             f'[NEUTRALITY] Profiles [{self._base.toString()}] and [{self._mapped.toString()}] are linked by mapping {self._mapping}.'
     
+    def getProfiles(self):
+        return {self._base, self._mapped}
+
     # an instance of neutrality is identified by the mapping and profiles it regards
     # note: we need to store a dictionary as a frozenset of its tuples (mappings)
     # because dictionaries are not hashable
@@ -31,6 +31,11 @@ class PositiveResponsiveness(InterInstance):
         # return the profile
         return Profile(p_dict)
 
+    # the instances only depend on the profile
+    @classmethod
+    def cacheKey(cls, profile, goal, reachedBy = set()):
+        return ()
+
     @classmethod
     def getInstancesAndProfiles(cls, profile, goal, reachedBy = set()):
         P = set()
@@ -42,7 +47,7 @@ class PositiveResponsiveness(InterInstance):
             for b in profile.uniqueBallots():
 
                 # rank (position) of alternative in the ballot
-                rank = b.index(x)
+                rank = profile.rank(b, x)
 
                 # can we lower it?
                 if rank < len(b)-1:
@@ -89,5 +94,8 @@ class PositiveResponsiveness(InterInstance):
         return \
             f'[POSITIVE RESPONSENESS] In profile [{self._lifted.toString()}] {self._raisedAlt} gained support from profile [{self._base.toString()}]. Thus if {self._raisedAlt} wins in the latter, it must be the only winner in the former.'
 
+    def getProfiles(self):
+        return {self._base, self._lifted}
+
     def _computeHashable(self):
         return (self._base, self._lifted, self._raisedAlt)
\ No newline at end of file
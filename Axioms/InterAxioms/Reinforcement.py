@@ -1,5 +1,5 @@
 from Axioms.Utils.InterInstance import InterInstance
-from Helpers import bin_partitions
+from Helpers import count_splits
 from itertools import permutations
 from Profile import Profile
 
@@ -13,6 +13,11 @@ class Reinforcement(InterInstance):
         # subprofiles. Why sorted? To avoid repetitions (i.e., p=p1+p2 and p=p2+p1 are the same instance)
         self._part1, self._part2 = sorted((p1, p2))
 
+    # the instances only depend on the profile and on whether it can be extended (see PART TWO below)
+    @classmethod
+    def cacheKey(cls, profile, goal, reachedBy = set()):
+        return (len(profile) < len(goal),)
+
     @classmethod
     def getInstancesAndProfiles(cls, profile, goal, reachedBy = set()):
 
@@ -21,16 +26,15 @@ class Reinforcement(InterInstance):
 
         ## PART ONE: instance where "profile" is the superprofile.
         if len(profile) > 1:
-            # all possible partitions of the ballots
-            # notice we enumerate them, so every ballot has an unique id (i, ballot)
-            for first, second in bin_partitions(enumerate(profile.allBallots())):
+            # all possible splits of the ballots in two parts. Voters with the same ballot
+            # are interchangeable, so we split the counts of the ballots: each pair of
+            # subprofiles comes up once.
+            ballots, counts = zip(*profile.getTuples())
+            for first, second in count_splits(counts):
 
-                # take only the ballots
-                first = [b for i, b in first]
-                second = [b for i, b in second]
-
-                # construct the profiles
-                first_profile, second_profile = Profile(first), Profile(second)
+                # construct the profiles (ballots with count 0 are dropped)
+                first_profile = Profile(dict(zip(ballots, first)))
+                second_profile = Profile(dict(zip(ballots, second)))
 
                 # get instance
                 inst = cls(profile, first_profile, second_profile)
@@ -99,6 +103,9 @@ class Reinforcement(InterInstance):
         return \
         f'[REINFORCEMENT] Profiles [{self._part1.toString()}] and [{self._part2.toString()}] are disjoint. Thus, if the intersection of F([{self._part1.toString()}]) and F([{self._part2.toString()}]) is non-empty, it must be equal to F([{self._profile.toString()}]).'
 
+    def getProfiles(self):
+        return {self._profile, self._part1, self._part2}
+
     def _computeHashable(self):
         # instance is identified by super, subprofile1 and subprofile2
         # note that we sort p1 and p2 when creating the instance, hence
@@ -13,6 +13,11 @@ class Cancellation(IntraInstance):
     def getInstances(cls, profile, goal, reachedBy = set()):
         return {cls(profile)} if profile.isCancellation() else set()
 
+    # cancellation profiles of a whole table at once
+    @classmethod
+    def getInstancesBatch(cls, table, goal, reachedBy):
+        return [{cls(profile)} if cancellation else set() for profile, cancellation in zip(table.profiles, table.isCancellation())]
+
     def _computeSAT(self, SAT):
         return [[SAT.getLiteral(self._profile, x)] for x in self._profile.getAlternatives()]
 
@@ -17,6 +17,12 @@ class Condorcet(IntraInstance):
 
         return {cls(profile, condorcet)} if condorcet is not None else set()
 
+    # Condorcet winners of a whole table at once
+    @classmethod
+    def getInstancesBatch(cls, table, goal, reachedBy):
+        return [{cls(profile, condorcet)} if condorcet is not None else set() \
+            for profile, condorcet in zip(table.profiles, table.getCondorcet())]
+
     def _computeSAT(self, SAT):
 
         c = self._condorcet
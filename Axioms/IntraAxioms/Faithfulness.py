@@ -14,6 +14,10 @@ class Faithfulness(IntraInstance):
     def getInstances(cls, profile, goal, reachedBy = set()):
         return {cls(profile)} if len(profile) == 1 else set()
 
+    @classmethod
+    def getInstancesBatch(cls, table, goal, reachedBy):
+        return [{cls(profile)} if singleton else set() for profile, singleton in zip(table.profiles, table.isSingleton())]
+
     def _computeSAT(self, SAT):
         return [[(1 if x == self._top else -1) * SAT.getLiteral(self._profile, x)] for x in self._profile.getAlternatives()]
 
@@ -21,6 +21,13 @@ class Pareto(IntraInstance):
         
         return I
 
+    # Pareto-dominated alternatives of a whole table at once
+    @classmethod
+    def getInstancesBatch(cls, table, goal, reachedBy):
+        dominated = table.getParetoDominated()
+        return [{cls(profile, x) for j, x in enumerate(table.alternatives) if dominated[i, j]} \
+            for i, profile in enumerate(table.profiles)]
+
     # in this profile, the pareto-dom alt must lose.
     def _computeSAT(self, SAT):
         return [[-SAT.getLiteral(self._profile, self._pareto)]]
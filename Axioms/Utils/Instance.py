@@ -23,6 +23,14 @@ class Instance:
     def normativeBasis(cls):
         return {cls.axiomName()}
 
+    # key used to store the instances of this axiom for a profile in an InstanceCache
+    # (together with the axiom name and the profile). It must contain whatever else, besides
+    # the profile, the generated instances depend on (e.g. the goal). None ---> do not cache
+    # (the default: only worth it for axioms that are costly to generate).
+    @classmethod
+    def cacheKey(cls, profile, goal, reachedBy = set()):
+        return None
+
     def __init__(self):
         # lazy construction
         # these things cost time to create,
@@ -62,6 +70,10 @@ class Instance:
     def _computeHashable(self):
         return None
 
+    # profiles whose variables appear in the SAT encoding of this instance
+    def getProfiles(self):
+        return set()
+
     # sort of "signature" of an instance, used to distinguish it
     # from other instances
     # axiomName makes it unique between axioms, the hashable thing
@@ -77,6 +89,13 @@ class Instance:
 
         return self._hashable
 
+    # when pickled (e.g. by InstanceCache), we drop the lazy stuff: in particular, the SAT encoding
+    # depends on the numbering of the variables of a specific SATEncoding object.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_hash'], state['_cnf'], state['_string'] = None, None, None
+        return state
+
     def __eq__(self, OtherInstance):
         return self._getHashable() == OtherInstance._getHashable()
 
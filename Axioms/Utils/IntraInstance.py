@@ -13,4 +13,16 @@ class IntraInstance(Instance):
     # 'profile'. These two bits of information might be used for heuristics
     @classmethod
     def getInstances(cls, profile, goal, reachedBy = set()):
-        return set()
\ No newline at end of file
+        return set()
+
+    # same, for many profiles at once: table is a ProfileTable, reachedBy maps each
+    # profile to the instances reaching it. Returns the list of the sets of instances of
+    # each profile of the table. By default, profiles are checked one by one: axioms that can
+    # be decided on the whole table at once (see ProfileTable) override this.
+    @classmethod
+    def getInstancesBatch(cls, table, goal, reachedBy):
+        return [cls.getInstances(profile, goal, reachedBy[profile]) for profile in table.profiles]
+
+    # an intraprofile instance only talks about its profile
+    def getProfiles(self):
+        return {self._profile}
@@ -0,0 +1,86 @@
+# Limits on the resources a justification may use (see iterjustify): wall-clock time, peak memory,
+# and size of the instance graph. None ---> no limit.
+#
+# The budget is checked cooperatively, at the points where the work can stop cleanly: between the
+# axioms generating instances (GraphGen), before each SAT call (SATSolver), and between the gMUSes
+# extracted (SATEncoding). A call already running (e.g. a single SAT call, or the shrinking of a
+# seed to a MUS) is not interrupted: the budget can be overrun by that much.
+#
+# When a limit is reached, check raises BudgetExhausted, which iterjustify catches: it then returns
+# what it has, and budget.report() says which limit ran out, and how far the justification got.
+
+import resource
+import sys
+from time import time
+
+class BudgetExhausted(Exception):
+    pass
+
+class Budget():
+
+    # seconds: wall-clock time, from the creation of the budget
+    # memory: resident memory of the process, in MB (the worker processes of GraphGen are not counted)
+    # instances, profiles: size of the instance graph
+    def __init__(self, seconds = None, memory = None, instances = None, profiles = None):
+        self.seconds = seconds
+        self.memory = memory
+        self.instances = instances
+        self.profiles = profiles
+
+        self.start = time()
+        # which limit ran out (None ---> none yet)
+        self.exhausted = None
+        # how far the justification got (see note)
+        self.progress = {}
+
+    # seconds left (None ---> no time limit)
+    def remaining(self):
+        if self.seconds is None:
+            return None
+        return max(self.seconds - (time() - self.start), 0)
+
+    # resident memory of the process now, in MB. Where /proc is not available, the peak (see peakMemory)
+    @staticmethod
+    def currentMemory():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+        except OSError:
+            return Budget.peakMemory()
+
+    # peak resident memory of the process (over its whole life, not just since the budget), in MB
+    @staticmethod
+    def peakMemory():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, KB elsewhere
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+    # name of the limit that ran out, if any (and remember it). instances, profiles: current size of the graph
+    def exceeded(self, instances = None, profiles = None):
+        if self.exhausted is None:
+            if self.seconds is not None and time() - self.start > self.seconds:
+                self.exhausted = 'time'
+            elif self.memory is not None and self.currentMemory() > self.memory:
+                self.exhausted = 'memory'
+            elif self.instances is not None and instances is not None and instances > self.instances:
+                self.exhausted = 'instances'
+            elif self.profiles is not None and profiles is not None and profiles > self.profiles:
+                self.exhausted = 'profiles'
+
+        return self.exhausted
+
+    # raise BudgetExhausted if a limit ran out
+    def check(self, instances = None, profiles = None):
+        if self.exceeded(instances, profiles) is not None:
+            raise BudgetExhausted(self.exhausted)
+
+    # record how far the justification got (e.g. depth, instances)
+    def note(self, **progress):
+        self.progress.update(progress)
+
+    def report(self):
+        """ What happened, as a dict: the limit that ran out ('exhausted': 'time', 'memory', 'instances',
+        'profiles', or None), the time used, the memory of the process (now, and its peak), and the
+        progress noted (see iterjustify). """
+        return {'exhausted': self.exhausted, 'elapsed': time() - self.start, 'memory': self.currentMemory(), \
+            'peak_memory': self.peakMemory(), **self.progress}
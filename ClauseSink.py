@@ -0,0 +1,120 @@
+# Group CNF, built while the instance graph is generated.
+#
+# Instances are encoded as soon as they are added (e.g. by GraphGen), and each instance gets
+# a group ID (its index, from 0). Nothing else is stored about an instance: neither its clauses
+# (the instance does not cache them) nor a copy of the set of instances. The instance itself only
+# holds its parameters (mostly, profiles shared with the graph), which is all we need to write
+# its explanation, if it ends up in a gMUS.
+#
+# The clauses are not stored as python lists: all the literals are in a single array of C ints,
+#   literals[clauseOffsets[c]:clauseOffsets[c+1]] is the clause c, and
+#   the clauses of group i are the clauses from groupOffsets[i] to groupOffsets[i+1] (excluded).
+# That's 4 bytes per literal, instead of a python int (plus a list) each. A clause is handed out
+# as an array('i') too, which is what the MiniSat bindings (solver and gMUS extractor) take as is.
+#
+# The Goal instance is a group without clauses: its clause depends on the outcome, and is given
+# when solving (see getGroups).
+
+from array import array
+
+class ClauseSink():
+
+    # SAT: the SATEncoding giving the propositional variables
+    def __init__(self, SAT):
+        self.SAT = SAT
+
+        # instance ---> group ID. Also used to skip the instances we already have.
+        self._IDs = {}
+        # group ID ---> instance
+        self.records = []
+
+        # see above
+        self.literals = array('i')
+        self.clauseOffsets = array('q', [0])
+        self.groupOffsets = array('q', [0])
+
+        # group ID of the Goal instance
+        self.goalID = None
+
+    # encode an instance, unless we already have it. Returns whether it was new.
+    def add(self, instance):
+        if instance in self._IDs:
+            return False
+
+        ID = len(self.records)
+        self._IDs[instance] = ID
+        self.records.append(instance)
+
+        if instance.axiomName() == 'Goal':
+            self.goalID = ID
+        else:
+            # we do not go through getInstanceSAT: the instance would keep its clauses
+            for clause in instance._computeSAT(self.SAT):
+                self.literals.extend(clause)
+                self.clauseOffsets.append(len(self.literals))
+
+        self.groupOffsets.append(self.nbClauses())
+        return True
+
+    def update(self, instances):
+        for instance in instances:
+            self.add(instance)
+
+    # the sink can stand for the set of instances (e.g. GraphGen.I)
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __contains__(self, instance):
+        return instance in self._IDs
+
+    def getID(self, instance):
+        return self._IDs[instance]
+
+    def nbClauses(self):
+        return len(self.clauseOffsets) - 1
+
+    # clause c, as an array('i')
+    def getClause(self, c):
+        return self.literals[self.clauseOffsets[c]:self.clauseOffsets[c+1]]
+
+    # clauses from start to stop (excluded)
+    def iterClauses(self, start = 0, stop = None):
+        if stop is None:
+            stop = self.nbClauses()
+        literals, offsets = self.literals, self.clauseOffsets
+        for c in range(start, stop):
+            yield literals[offsets[c]:offsets[c+1]]
+
+    # clauses of a group
+    def getGroup(self, ID):
+        return list(self.iterClauses(self.groupOffsets[ID], self.groupOffsets[ID+1]))
+
+    # the groups of clauses (by ID), with goal_clauses as the clauses of the Goal instance.
+    # The clauses of a group are only read when the group is needed.
+    def getGroups(self, goal_clauses):
+        return _Groups(self, goal_clauses)
+
+# sequence of the groups of a ClauseSink (see ClauseSink.getGroups)
+class _Groups():
+
+    def __init__(self, sink, goal_clauses):
+        self._sink = sink
+        self._goalClauses = goal_clauses
+
+    def __len__(self):
+        return len(self._sink)
+
+    def __getitem__(self, ID):
+        if ID == self._sink.goalID:
+            return self._goalClauses
+        return self._sink.getGroup(ID)
+
+    def __iter__(self):
+        for ID in range(len(self)):
+            yield self[ID]
+
+    def nbClauses(self):
+        return self._sink.nbClauses() + len(self._goalClauses)
@@ -0,0 +1,122 @@
+# Frontier policies of GraphGen: in which order the reached profiles are explored.
+#
+# A frontier holds the pairs (profile, depth) reached but not explored yet (possibly several times
+# the same profile: GraphGen skips the profiles it already explored), and hands them out one level
+# at a time: all the profiles at the smallest depth. Profiles always come out by depth, so that each
+# one is explored at its smallest depth: the depth bound of the graph depends on it (a profile first
+# reached by a longer path would miss its interprofile instances at the maximum depth).
+# What a policy chooses is the order within a level. This matters with checkpoints (see GraphGen.expand),
+# which check for a proof every few profiles, and stop as soon as there is one: the sooner the profiles
+# of the proof are explored, the less of the level we generate.
+#
+#   BreadthFirst: in the order they were reached (plain BFS, the default)
+#   BestFirst: most promising first, by a score computed from cheap signals of the profile
+
+from collections import deque
+import heapq
+
+class BreadthFirst():
+
+    def __init__(self):
+        self._queue = deque()
+
+    def __len__(self):
+        return len(self._queue)
+
+    # profile reached at depth, by instance (None for the goal)
+    def push(self, profile, depth, instance = None):
+        self._queue.append((profile, depth))
+
+    # the profiles at the smallest depth, in order (with repetitions), and that depth
+    def popLevel(self):
+        depth = self._queue[0][1]
+        level = []
+        while self._queue and self._queue[0][1] == depth:
+            level.append(self._queue.popleft()[0])
+        return level, depth
+
+    # put back profiles of a level (popped, but not explored): they come out first again, in the same order
+    def pushBack(self, profiles, depth):
+        self._queue.extendleft((profile, depth) for profile in reversed(profiles))
+
+class BestFirst():
+    """ Within a level, explore the profiles by increasing score: a weighted sum of
+    - ANCHOR if an intraprofile axiom of the corpus applies to the profile: Faithfulness (a single voter),
+      Condorcet (a Condorcet winner), Cancellation (all pairs tie) or Pareto (a dominated alternative).
+      These profiles pin (part of) their outcome, so proofs end there.
+    - VOTERS per voter: small profiles have fewer instances, and lead to the anchors above.
+    - DISTANCE per unit of distance to the goal profile: the number of voters to add or remove to get one from
+      the other ('count'), or the sum of the differences of their pairwise supports ('kendall').
+    - AXIOMS[name] if the profile was reached by an instance of that axiom (the best such weight, if reached by several).
+    The weights are class attributes, and can be overridden by the arguments. """
+
+    # on a sample of profiles justified at depth 2, checked every 10 profiles, these weights generated
+    # about 20% fewer instances than BFS before finding the proof (the distance did not help)
+    ANCHOR = -4
+    VOTERS = 1
+    DISTANCE = 0
+    AXIOMS = {'PositiveResponsiveness': -2}
+
+    def __init__(self, goal, axioms_to_use, distance = 'count', anchor = None, voters = None, weight = None, axioms = None):
+        self.goal = goal
+        self.distance = distance
+        self.anchor = self.ANCHOR if anchor is None else anchor
+        self.voters = self.VOTERS if voters is None else voters
+        self.weight = self.DISTANCE if weight is None else weight
+        self.axioms = self.AXIOMS if axioms is None else axioms
+
+        # the anchor axioms of the corpus
+        self._anchors = {'Faithfulness', 'Condorcet', 'Cancellation', 'Pareto'}.intersection(axioms_to_use)
+        # heap of (depth, score, order of arrival, profile)
+        self._heap = []
+        self._count = 0
+        # profile ---> score, without the axiom of the instance (profiles are reached many times)
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _isAnchor(self, profile):
+        return ('Faithfulness' in self._anchors and len(profile) == 1) \
+            or ('Condorcet' in self._anchors and profile.getCondorcet() is not None) \
+            or ('Cancellation' in self._anchors and profile.isCancellation()) \
+            or ('Pareto' in self._anchors and profile.hasPareto())
+
+    def _distance(self, profile):
+        if self.distance == 'kendall':
+            return int(abs(profile.getSupportMatrix() - self.goal.getSupportMatrix()).sum())
+
+        counts, goal = dict(profile.getKey()), dict(self.goal.getKey())
+        return sum(abs(counts.get(r, 0) - goal.get(r, 0)) for r in counts.keys() | goal.keys())
+
+    # score of a profile (lower ---> explored first), reached by instance
+    def score(self, profile, instance = None):
+        if profile not in self._scores:
+            score = self.voters * len(profile)
+            if self.anchor and self._isAnchor(profile):
+                score += self.anchor
+            if self.weight:
+                score += self.weight * self._distance(profile)
+            self._scores[profile] = score
+
+        if instance is None:
+            return self._scores[profile]
+        return self._scores[profile] + self.axioms.get(instance.axiomName(), 0)
+
+    def push(self, profile, depth, instance = None):
+        heapq.heappush(self._heap, (depth, self.score(profile, instance), self._count, profile))
+        self._count += 1
+
+    def popLevel(self):
+        depth = self._heap[0][0]
+        level = []
+        while self._heap and self._heap[0][0] == depth:
+            profile = heapq.heappop(self._heap)[3]
+            # scores are only needed while the profile is waiting
+            self._scores.pop(profile, None)
+            level.append(profile)
+        return level, depth
+
+    def pushBack(self, profiles, depth):
+        for profile in profiles:
+            self.push(profile, depth)
@@ -1,69 +1,357 @@
-from collections import deque, defaultdict
+from collections import defaultdict
 from Axioms.Utils.axiomIterator import intraAxioms, interAxioms, derived_axioms
 from Axioms.IntraAxioms.Goal import Goal
+from ProfileTable import ProfileTable
+from InstanceCache import InstanceCache
+from AxiomStats import AxiomStats
+from Frontier import BreadthFirst
+import multiprocessing
+import gc
 
-# Function that, given a goal profile (goal), the axioms, and a maximum depth,
-# generate corresponding the instance graph (that is, profiles and instances)
-def GraphGen(goal, axioms_to_use, MAX_DEPTH):
-
-    # Goal(profile) ---> Goal instance of the profile
-    # The outcome will be specified later on, before encoding
-    # the instances as SAT. The reason is that we want to try to
-    # justify multiple outcomes.
-    goal_instance = Goal(goal)
-
-    # fifo queue used to explore the graph, a là BFS
-    fifo = deque()
-    # (profile, depth)
-    fifo.append((goal, 0))
-
-    # init instances and profiles sets
-    I, P = set(), set()
-    I.add(goal_instance)
-
-    # used to memorise, for each profile, by which
-    # instances it has been reached. Useful to make some heuristics
-    reachedBy = defaultdict(set)
-    reachedBy[goal].add(goal_instance)
-    
-    # while the queue is nonempty
-    while fifo:
-        
-        # pop a profile, and its depth
-        profile, depth = fifo.popleft()
-
-        # if profile was not explored yet...
-        if profile not in P:
-
-            # ...now it is!
-            P.add(profile)
+# Object that, given a goal profile (goal) and the axioms, generates
+# the corresponding instance graph (that is, profiles and instances).
+# The graph is grown depth by depth: calling expand(d) after expand(d-1)
+# only explores the profiles that are new at depth d, instead of
+# regenerating everything from scratch.
+#
+# With quotient = True, the graph is quotiented by neutrality: only one profile per orbit
+# (its canonical representative, see Profile.canonical) is explored, and no Neutrality instance
+# is generated. The instances still mention the concrete profiles: the SAT encoding maps them to
+# the variables of their representative, and explanations are lifted back (see SATEncoding).
+# This divides the size of the graph by up to m!, but requires Neutrality among the axioms.
+# Depths are measured in the quotient: a neutrality link costs no depth, so a justification
+# can be found at a smaller depth than without the quotient (not comparable with it).
+#
+# With processes = N, each level is split in chunks, whose instances are generated by N worker
+# processes. The parent merges them, and builds the next level (call close() at the end).
+#
+# With a sink (a ClauseSink), the instances are encoded as soon as they are added to the graph,
+# and the sink stands for the set of instances I: no other copy of them is kept.
+#
+# With stats (an AxiomStats), the work done by each axiom at each depth is counted: calls, time,
+# instances generated (new or duplicates), profiles reached.
+#
+# With a budget (a Budget), generation stops with BudgetExhausted when it runs out: it is checked
+# before each call of an axiom (and, in parallel mode, as the chunks come back).
+#
+# With a strategy (a frontier policy, see Frontier.py), the profiles of each level are explored in
+# the order it chooses (e.g. most promising first, with BestFirst). Default: BFS order.
+class GraphGen():
 
+    # levels with fewer profiles than this are not worth sending to the worker processes
+    PARALLEL_MIN = 64
+
+    # cache: an InstanceCache, to store (and reuse) the generated instances on disk. None ---> no cache
+    # processes: number of worker processes generating the instances of each level. None ---> no workers
+    # sink: a ClauseSink, to encode the instances on the way. None ---> I is a set of instances
+    # stats: an AxiomStats, to count what each axiom does. None ---> no counting
+    # budget: a Budget, to stop when it runs out. None ---> no limit
+    # strategy: the frontier policy, e.g. a BestFirst. None ---> BreadthFirst
+    def __init__(self, goal, axioms_to_use, cache = None, quotient = False, processes = None, sink = None, stats = None, \
+        budget = None, strategy = None):
+
+        if quotient and 'Neutrality' not in axioms_to_use:
+            raise Exception("The quotient by neutrality needs Neutrality among the axioms.")
+
+        self.goal = goal
+        self.axioms_to_use = axioms_to_use
+        self.cache = cache
+        self.quotient = quotient
+        self.processes = processes
+        self.stats = stats
+        self.budget = budget
+        # pool of worker processes: created when first needed
+        self._pool = None
+
+        # Goal(profile) ---> Goal instance of the profile
+        # The outcome will be specified later on, before encoding
+        # the instances as SAT. The reason is that we want to try to
+        # justify multiple outcomes.
+        self.goal_instance = Goal(goal)
+
+        # queue of the profiles to explore (with their depth): level by level, a là BFS
+        self._queue = BreadthFirst() if strategy is None else strategy
+        self._queue.push(self._representative(goal), 0)
+
+        # init instances and profiles sets
+        self.I = set() if sink is None else sink
+        self.P = set()
+        self.I.add(self.goal_instance)
+
+        # used to memorise, for each profile, by which
+        # instances it has been reached. Useful to make some heuristics
+        self._reachedBy = defaultdict(set)
+        self._reachedBy[self._representative(goal)].add(self.goal_instance)
+
+        # profiles (with their depth) that have been explored, but whose
+        # interprofile instances have not been generated yet because they
+        # sit at the maximum depth. This is where we resume from.
+        self._frontier = []
+
+        # maximum depth generated so far (None ---> unbounded)
+        self.depth = -1
+        # did a checkpoint stop the last expansion? (see expand)
+        self.stopped = False
+
+    # profile that stands for profile in the graph: itself, or its representative in the quotient
+    def _representative(self, profile):
+        return profile.canonical()[0] if self.quotient else profile
+
+    # instances generated by an axiom for a profile, through the cache (if any).
+    # generate is the generating method of the axiom (getInstances or getInstancesAndProfiles).
+    def _generate(self, axiom, generate, profile):
+        if self.cache is None:
+            return generate(profile, self.goal, self._reachedBy[profile])
+        else:
+            return self.cache.get(axiom, generate, profile, self.goal, self._reachedBy[profile])
+
+    # call generate(*args) on behalf of an axiom, at some depth, covering calls profiles:
+    # this is where the stats (if any) count calls and time, and where the budget (if any) is checked
+    def _call(self, axiom, depth, calls, generate, *args):
+        if self.budget is not None:
+            self.budget.check(len(self.I), len(self.P))
+        if self.stats is None:
+            return generate(*args)
+        return self.stats.timed(axiom.axiomName(), depth, calls, generate, *args)
+
+    # generate the instances of some new profiles (of the same level, at this depth), without touching the graph.
+    # intra: generate the intraprofile (and derived) instances. inter: generate the interprofile ones.
+    # Returns the list of intraprofile instances, and the list of pairs (reached profile, instance)
+    # for the interprofile ones (reached profiles are already representatives, in the quotient).
+    # This is also what the worker processes run, in parallel mode.
+    def _explore(self, profiles, intra, inter, depth):
+
+        instances, reached = [], []
+
+        if intra:
             # for every intraprofile axiom (among those we wanna use),
-            # get the instances for this profile. Also pass the instances that reach the profile,
+            # get the instances for these profiles, as a table. Also pass the instances that reach the profiles,
             # in case some heuristic is in place.
-            for axiom in intraAxioms(axioms_to_use):
-                I_prime = axiom.getInstances(profile, goal, reachedBy[profile])
-                I.update(I_prime)
-
-            # same for derived axioms.
-            for derived_axiom in derived_axioms(axioms_to_use):
-                I_prime = derived_axiom.getInstancesAndProfiles(profile, goal, reachedBy[profile])
-                I.update(I_prime)
-
-            # if the current depth < max depth, also expand the inter-profile instances.
-            # (max_depth = None ---> no bound)
-            if (MAX_DEPTH is None or depth < MAX_DEPTH):
-                for axiom in interAxioms(axioms_to_use):
-                    P_prime = axiom.getInstancesAndProfiles(profile, goal, reachedBy[profile])
-
-                    # add reached profiles 
-                    # to the queue, with a depth+1
+            table = ProfileTable(profiles)
+            for axiom in intraAxioms(self.axioms_to_use):
+                batch = self._call(axiom, depth, len(profiles), axiom.getInstancesBatch, table, self.goal, self._reachedBy)
+                for I_prime in batch:
+                    instances.extend(I_prime)
+
+                if self.stats is not None:
+                    self.stats.add(axiom.axiomName(), depth, 'instances', sum(map(len, batch)))
+
+            # derived axioms, one profile at a time.
+            for profile in profiles:
+                for derived_axiom in derived_axioms(self.axioms_to_use):
+                    I_prime = self._call(derived_axiom, depth, 1, self._generate, derived_axiom, derived_axiom.getInstancesAndProfiles, profile)
+                    instances.extend(I_prime)
+
+                    if self.stats is not None:
+                        self.stats.add(derived_axiom.axiomName(), depth, 'instances', len(I_prime))
+
+        if inter:
+            for profile in profiles:
+                for axiom in interAxioms(self.axioms_to_use):
+                    # in the quotient, neutrality links are implicit
+                    if self.quotient and axiom.axiomName() == 'Neutrality':
+                        continue
+
+                    P_prime = self._call(axiom, depth, 1, self._generate, axiom, axiom.getInstancesAndProfiles, profile)
                     for p, inst in P_prime:
-                        fifo.append((p, depth+1))
-                        I.add(inst)
-                        reachedBy[p].add(inst)
+                        reached.append((self._representative(p), inst))
+
+                    if self.stats is not None:
+                        # an instance usually reaches several profiles: count it once
+                        self.stats.add(axiom.axiomName(), depth, 'instances', len({inst for _, inst in P_prime}))
+
+        return instances, reached
+
+    # same as _explore, but split among the worker processes (if any, and if there are enough profiles)
+    def _exploreAll(self, profiles, intra, inter, depth):
+
+        if self.processes is None or len(profiles) < self.PARALLEL_MIN:
+            return self._explore(profiles, intra, inter, depth)
+
+        if self._pool is None:
+            # fork: the workers get the axioms (and the rest) without pickling them
+            context = multiprocessing.get_context('fork')
+            cache = None if self.cache is None else (self.cache.path, self.cache.maxSize)
+            self._pool = context.Pool(self.processes, initializer = _initWorker, \
+                initargs = (self.goal, self.axioms_to_use, cache, self.quotient))
+
+        # a few chunks per worker, to balance the load. The heuristics only look at the axioms
+        # of the instances reaching a profile, so we send those (classes pickle by name), not the instances.
+        size = -(-len(profiles) // (4 * self.processes))
+        tasks = []
+        for i in range(0, len(profiles), size):
+            chunk = profiles[i:i+size]
+            reachedBy = [{type(inst) for inst in self._reachedBy[profile]} for profile in chunk]
+            tasks.append((chunk, reachedBy, intra, inter, depth, self.stats is not None))
+
+        # unpickling the results creates lots of objects at once: meanwhile, the garbage collector
+        # would walk the whole graph over and over, for nothing (there are no cycles to collect here)
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            instances, reached = [], []
+            for I_chunk, R_chunk, stats in self._pool.imap(_exploreChunk, tasks):
+                instances.extend(I_chunk)
+                reached.extend(R_chunk)
+                if stats is not None:
+                    self.stats.merge(stats)
+                if self.budget is not None:
+                    self.budget.check(len(self.I) + len(instances), len(self.P))
+        finally:
+            if enabled:
+                gc.enable()
+
+        return instances, reached
+
+    # add to the graph what was generated for some profiles at this depth: the reached profiles
+    # are pushed to the queue, with a depth+1. inter: were their interprofile instances generated?
+    # (otherwise, they are remembered in the frontier)
+    def _merge(self, profiles, depth, instances, reached, inter):
+
+        if self.stats is not None:
+            self._count(depth, instances, reached)
+
+        self.I.update(instances)
+
+        for p, inst in reached:
+            self.I.add(inst)
+            # the profiles already explored (or being explored, in this level) need neither: this way, their
+            # reachedBy does not depend on how the level is split (e.g. by checkpoints), or on the order
+            if p not in self.P:
+                self._queue.push(p, depth+1, inst)
+                self._reachedBy[p].add(inst)
+
+        for profile in profiles:
+            if inter:
+                # profile explored: no need to remember how it was reached, now.
+                self._reachedBy.pop(profile, None)
+            else:
+                self._frontier.append((profile, depth))
+
+    # stats of what is merged (see _merge): new instances and reached profiles, by axiom
+    def _count(self, depth, instances, reached):
+        seen = set()
+        for inst in instances:
+            if inst not in self.I and inst not in seen:
+                seen.add(inst)
+                self.stats.add(inst.axiomName(), depth, 'new')
+
+        reachedNow = set()
+        for p, inst in reached:
+            if inst not in self.I and inst not in seen:
+                seen.add(inst)
+                self.stats.add(inst.axiomName(), depth, 'new')
+
+            # a profile is new if it was neither explored nor reached before
+            if p in self.P or p in self._reachedBy or p in reachedNow:
+                self.stats.add(inst.axiomName(), depth, 'seenProfiles')
+            else:
+                reachedNow.add(p)
+                self.stats.add(inst.axiomName(), depth, 'newProfiles')
+
+    # explore a level of new profiles (all at the same depth)
+    def _expandLevel(self, level, depth, MAX_DEPTH):
+
+        if not level:
+            return
+
+        # if the current depth < max depth, also expand the inter-profile instances.
+        # (max_depth = None ---> no bound)
+        # otherwise, remember the profiles: they will be expanded if we go deeper.
+        inter = MAX_DEPTH is None or depth < MAX_DEPTH
+
+        instances, reached = self._exploreAll(level, True, inter, depth)
+        self._merge(level, depth, instances, reached, inter)
+
+    # stop the worker processes (if any)
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    # grow the graph up to depth MAX_DEPTH (None ---> no bound). Returns instances and profiles.
+    # checkpoint: function called every `every` new profiles explored (None ---> at the end of each
+    # level). If it returns True, the generation stops right there, with self.stopped = True: the graph
+    # is then only partially grown, and calling expand again resumes from where it stopped.
+    def expand(self, MAX_DEPTH, checkpoint = None, every = None):
+
+        self.stopped = False
+
+        # nothing to do if we already got this far
+        if self.depth is None or (MAX_DEPTH is not None and MAX_DEPTH <= self.depth):
+            return self.I, self.P
+
+        # resume: the profiles at the previous maximum depth can now be expanded
+        # (if a checkpoint stopped us before, the frontier may also have profiles at this maximum depth: they stay)
+        frontier = [(profile, depth) for profile, depth in self._frontier if MAX_DEPTH is None or depth < MAX_DEPTH]
+        for depth in sorted({depth for _, depth in frontier}):
+            profiles = [profile for profile, d in frontier if d == depth]
+            self._frontier = [(profile, d) for profile, d in self._frontier if d != depth]
+
+            # with checkpoints, `every` profiles at a time (in the order they were explored: the strategy's)
+            size = every if checkpoint is not None and every else max(len(profiles), 1)
+            for start in range(0, len(profiles), size):
+                chunk = profiles[start:start+size]
+                instances, reached = self._exploreAll(chunk, False, True, depth)
+                self._merge(chunk, depth, instances, reached, True)
+
+                if checkpoint is not None and checkpoint():
+                    # the rest is still to resume
+                    self._frontier.extend((profile, depth) for profile in profiles[start+size:])
+                    self.stopped = True
+                    return self.I, self.P
+
+        # while the queue is nonempty, explore it level by level:
+        # the profiles at the same depth are checked all at once for the intraprofile axioms
+        while self._queue:
+
+            # pop all the profiles at the smallest depth (in the order of the strategy)
+            level = []
+            profiles, depth = self._queue.popLevel()
+            for profile in profiles:
+
+                # if profile was not explored yet, now it is!
+                if profile not in self.P:
+                    self.P.add(profile)
+                    level.append(profile)
+
+            # with checkpoints, the level is explored `every` profiles at a time
+            size = every if checkpoint is not None and every else max(len(level), 1)
+            for start in range(0, len(level), size):
+                self._expandLevel(level[start:start+size], depth, MAX_DEPTH)
+
+                if checkpoint is not None and checkpoint():
+                    # put back the rest of the level, to resume from there
+                    rest = level[start+size:]
+                    self.P.difference_update(rest)
+                    self._queue.pushBack(rest, depth)
+                    self.stopped = True
+                    return self.I, self.P
+
+        self.depth = MAX_DEPTH
+
+        return self.I, self.P
+
+# the GraphGen of a worker process (see GraphGen._exploreAll)
+_worker = None
+
+def _initWorker(goal, axioms_to_use, cache, quotient):
+    global _worker
+    # the objects inherited from the parent are never freed here: keep the garbage collector off them
+    gc.freeze()
+    # each worker has its own connection to the cache
+    cache = None if cache is None else InstanceCache(*cache)
+    _worker = GraphGen(goal, axioms_to_use, cache, quotient)
+
+def _exploreChunk(task):
+    profiles, reachedBy, intra, inter, depth, stats = task
+    _worker._reachedBy = defaultdict(set, zip(profiles, reachedBy))
+    # the stats of this chunk are sent back to the parent, which adds them up
+    _worker.stats = AxiomStats() if stats else None
+    instances, reached = _worker._explore(profiles, intra, inter, depth)
 
-            # profile explored: no need to remember how it was reached, now.
-            del reachedBy[profile]
+    # the pool terminates the workers at the end: write what we stored now
+    if _worker.cache is not None:
+        _worker.cache.flush()
 
-    return I, P
\ No newline at end of file
+    return instances, reached, _worker.stats
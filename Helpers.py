@@ -1,8 +1,19 @@
 ## various helper functions
-from itertools import chain, combinations, permutations
+from itertools import chain, combinations, permutations, product
 from operator import sub
 from scipy.special import binom
 from math import factorial
+import os
+import sys
+
+# folder of the gMUS extractor (MARCO), which also ships the MiniSat python bindings
+GMUS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gMUS')
+
+def gMUS_importable():
+    # the modules of the gMUS extractor import each other by their bare name
+    # (e.g. `import utils`), so their folder must be in the path to use them from here
+    if GMUS_FOLDER not in sys.path:
+        sys.path.append(GMUS_FOLDER)
 
 def kPermutations(iterable, k):
     # all permutations of all subsets of k elements of iterable
@@ -31,7 +42,7 @@ def bin_partitions(A):
     # assign the current subset to the same set with the fixed element, all the rest in the other
     # avoid the case with all the elements in the first set
 
-    # I use this in the Reinforcement axiom
+    # (the Reinforcement axiom uses count_splits below, which does not tell apart equal elements)
 
     A = set(A)
     listA = list(A)
@@ -41,6 +52,21 @@ def bin_partitions(A):
         if len(first) < len(listA):
             yield (first, A-first)
 
+def count_splits(counts):
+    # Splits of a multiset in two non-empty parts, where the multiset is given by
+    # the counts of its distinct elements (e.g. the counts of the ballots of a profile).
+    # Yields pairs (first, second) of count tuples with first + second = counts.
+    # Each unordered split is yielded once: we keep the one with first <= second
+    # (lexicographically), i.e. about prod(c+1)/2 splits instead of 2^(n-1) partitions of the elements.
+
+    # I use this in the Reinforcement axiom
+
+    counts = tuple(counts)
+    for first in product(*(range(c+1) for c in counts)):
+        second = tuple(c - f for c, f in zip(counts, first))
+        if first <= second and any(first):
+            yield (first, second)
+
 def sum_to_n(n):
     # from https://stackoverflow.com/a/2065624
     # Generate the series of integer lists which sum to an integer, n.
@@ -0,0 +1,117 @@
+# Persistent on-disk cache of axiom instances.
+#
+# Generating the instances of some axioms (e.g. Reinforcement, Neutrality, QuasiTiedWinners)
+# for a profile is costly, and their result only depends on the profile (plus, for some axioms,
+# a small extra key: see Instance.cacheKey). This cache stores these results in a sqlite
+# database, keyed by axiom name and a stable fingerprint of the profile, so that repeated
+# experiments on overlapping profiles can skip most of the generation.
+#
+# The database can be bounded in size: the least recently used entries are evicted first.
+
+import pickle
+import sqlite3
+
+class InstanceCache():
+
+    # write the uses of the entries (for the LRU order) to disk every this many hits
+    TOUCH_EVERY = 1000
+
+    # path: file of the database (created if needed)
+    # maxSize: maximum size (in bytes) of the stored results. None ---> no bound
+    def __init__(self, path, maxSize = None):
+
+        self.path = path
+        self.maxSize = maxSize
+
+        # several processes may share the database: wait for locks, rather than failing. In WAL mode
+        # the readers do not block the writer; each write is a short transaction, so that no
+        # process holds the write lock for long
+        self._db = sqlite3.connect(path, timeout = 60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS instances (key TEXT PRIMARY KEY, value BLOB, size INTEGER, used INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS instances_used ON instances (used)")
+
+        # logical clock, to know which entries were used least recently
+        self._clock = self._db.execute("SELECT COALESCE(MAX(used), 0) FROM instances").fetchone()[0]
+        self._db.commit()
+        # key ---> last use, of the entries hit since the last flush (kept in memory, written by flush)
+        self._touched = {}
+
+        # some statistics
+        self.hits, self.misses = 0, 0
+
+    def _key(self, axiom, profile, extra):
+        return f"{axiom.axiomName()}:{profile.fingerprint()}:{extra}"
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    # size of the stored results. Other processes may share the database: always ask it
+    def _totalSize(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM instances").fetchone()[0]
+
+    # get the result of generate(profile, goal, reachedBy), which is the method generating the
+    # instances of axiom (getInstances or getInstancesAndProfiles), from the cache if it is there,
+    # otherwise compute it and store it.
+    def get(self, axiom, generate, profile, goal, reachedBy):
+
+        extra = axiom.cacheKey(profile, goal, reachedBy)
+
+        # not worth caching
+        if extra is None:
+            return generate(profile, goal, reachedBy)
+
+        key = self._key(axiom, profile, extra)
+
+        row = self._db.execute("SELECT value FROM instances WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            self._touched[key] = self._tick()
+            if len(self._touched) >= self.TOUCH_EVERY:
+                self.flush()
+            return pickle.loads(row[0])
+
+        self.misses += 1
+        result = generate(profile, goal, reachedBy)
+
+        value = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?)", (key, value, len(value), self._tick()))
+
+        if self.maxSize is not None and self._totalSize() > self.maxSize:
+            self._evict()
+
+        return result
+
+    # evict the least recently used entries, until we are (a bit) below the maximum size
+    def _evict(self):
+        target = 0.9 * self.maxSize
+
+        # the order must know about the recent hits
+        self.flush()
+
+        with self._db:
+            # take the write lock first: the size and the entries we read are the ones we delete from
+            self._db.execute("BEGIN IMMEDIATE")
+            size = self._totalSize()
+
+            evicted = []
+            for key, entrySize in self._db.execute("SELECT key, size FROM instances ORDER BY used"):
+                if size <= target:
+                    break
+                evicted.append((key,))
+                size -= entrySize
+
+            self._db.executemany("DELETE FROM instances WHERE key = ?", evicted)
+
+    # write the uses of the entries hit since the last flush, in one short transaction
+    def flush(self):
+        if self._touched:
+            with self._db:
+                self._db.executemany("UPDATE instances SET used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,192 @@
+# In-process interface to the gMUS extractor (MARCO, in the gMUS/ folder).
+#
+# Instead of writing a gcnf file and running gMUS/marco.py in a subprocess (which then
+# parses the file again in each of its children), the groups of clauses are loaded
+# directly in MARCO's solvers, and the MUSes are read from its enumerator.
+#
+# A "group CNF" is given as a sequence of groups, each group being a list of clauses
+# (a clause is a list, or array('i'), of non-zero ints), plus the number of variables.
+# The groups are identified by their index in the sequence (from 0): e.g. ClauseSink.getGroups.
+
+import array
+import atexit
+from contextlib import contextmanager
+from time import time
+from Helpers import gMUS_importable
+
+gMUS_importable()
+
+import utils
+import mapsolvers
+import CNFsolvers
+from MarcoPolo import MarcoPolo
+
+# Replaces the parsing of a (g)cnf file in MARCO's subset solvers: the formula
+# is a tuple (number of variables, groups, hard), where hard is a set of indexes of
+# groups that must always be included (they are added as hard clauses, i.e. gcnf group 0).
+class _GroupsReader(object):
+
+    def read_dimacs(self, formula):
+        nVars, groups, hard = formula
+
+        # soft groups, in order: the i-th soft group has gcnf id i+1
+        self.soft = [index for index in range(len(groups)) if index not in hard]
+
+        self.nvars = nVars
+        self.n = len(self.soft)
+        # the groups of a ClauseSink know their number of clauses: don't build every group to count them
+        if hasattr(groups, 'nbClauses'):
+            self.nclauses = groups.nbClauses()
+        else:
+            self.nclauses = sum(len(group) for group in groups)
+
+        self.s.set_varcounts(self.nvars, self.n)
+
+        # same as MinisatSubsetSolver.parse_dimacs: instance variables first,
+        # then the relaxation variables of the groups (defaulting to enabled)
+        while self.s.nvars() < self.nvars:
+            self.s.new_var()
+        while self.s.nvars() < self.nvars + self.n:
+            self.s.new_var(True)
+
+        groupIDs = [(index, 0) for index in hard] + [(index, groupID+1) for groupID, index in enumerate(self.soft)]
+
+        i = 0
+        for index, groupID in groupIDs:
+            for clause in groups[index]:
+                if groupID == 0:
+                    self.s.add_clause(clause)
+                else:
+                    self.s.add_clause_instrumented(clause, groupID-1)
+
+                # MUSer2 needs the clauses in text form
+                if self.store_dimacs:
+                    self.dimacs.append(b" ".join(str(x).encode() for x in clause) + b" 0\n")
+                    self.groups[groupID].append(i)
+
+                i += 1
+
+class GroupMinisatSubsetSolver(_GroupsReader, CNFsolvers.MinisatSubsetSolver):
+    pass
+
+class GroupMUSerSubsetSolver(_GroupsReader, CNFsolvers.MUSerSubsetSolver):
+    pass
+
+# create MARCO's subset solver for the formula. MUSer2 (a binary shipped with MARCO)
+# is much faster at shrinking seeds to MUSes; if it can't be run, we use MiniSat.
+# The solver is closed at the end of the with block (see _kill).
+@contextmanager
+def _subsetSolver(formula, muser = True):
+    csolver = None
+    if muser:
+        try:
+            csolver = GroupMUSerSubsetSolver(formula)
+            # MARCO's command line tool kills MUSer at exit; we clean up ourselves,
+            # so that the solver can be garbage collected.
+            atexit.unregister(csolver.cleanup)
+        except utils.ExecutableException:
+            pass
+
+    if csolver is None:
+        csolver = GroupMinisatSubsetSolver(formula)
+
+    try:
+        yield csolver
+    finally:
+        _kill(csolver)
+
+# kill the MUSer2 process of the subset solver, if one is running: when an exception (e.g. the
+# timeout of a batch job, or a KeyboardInterrupt) interrupts a shrink, nobody else waits for it
+def _kill(csolver):
+    proc = getattr(csolver, '_proc', None)
+    if proc is not None:
+        proc.kill()
+        proc.wait()
+        csolver._proc = None
+
+def enumerateMUSes(groups, nVars, limit = None, hard = (), muser = True):
+    """ Enumerate the MUSes of a group CNF. Inputs:
+    groups: sequence of groups of clauses (a group is a list of clauses).
+    nVars: number of propositional variables.
+    limit: stop after this many MUSes (None ---> all of them).
+    hard: indexes of the groups that are always included. Every MUS contains them.
+    muser: use MUSer2 to shrink the seeds (otherwise, MiniSat).
+    Yields each MUS as a sorted list of group indexes. """
+
+    hard = set(hard)
+    with _subsetSolver((nVars, groups, hard), muser) as csolver:
+        msolver = mapsolvers.MinisatMapSolver(csolver.n)
+        csolver.set_msolver(msolver)
+
+        # default configuration of MARCO: MUS bias, with model maximization
+        config = {'bias': 'MUSes', 'comms_ignore': False, 'maximize': True, 'verbose': False}
+        enumerator = MarcoPolo(csolver, msolver, utils.Statistics(), config)
+
+        found = 0
+        # results are ('U', MUS) or ('S', MSS), with 1-based ids of the soft groups
+        for kind, subset in enumerator.enumerate():
+            if kind == 'U':
+                yield sorted([csolver.soft[i-1] for i in subset] + list(hard))
+
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+def smallestMUS(groups, nVars, hard = (), muser = True, timeout = None, onBound = None):
+    """ Find a MUS of minimum size (number of groups) of a group CNF. Inputs as in enumerateMUSes, plus:
+    timeout: seconds after which we give up proving minimality (None ---> no limit).
+    onBound: function called as onBound(lower, upper) whenever a bound on the size improves.
+    Returns the MUS as a sorted list of group indexes (None if the group CNF is satisfiable),
+    and whether it is proven to be minimum (False if we ran out of time). """
+
+    # Implicit hitting sets: every MUS intersects every MCS (complement of an MSS). The map solver
+    # gives the smallest sets of groups not excluded yet (low bias: the cardinality bound only goes up),
+    # i.e. the smallest sets hitting all the MCSes found so far. If such a set is satisfiable, we grow it
+    # to an MSS, and exclude it (and its subsets) from the map. Otherwise, it is a MUS of minimum size:
+    # any smaller unsatisfiable set would contain a MUS, which also hits all those MCSes.
+    # The hard groups are always in (they are hard clauses of the subset solver, not in the map).
+    # Along the way: the cardinality bound of the map is a lower bound, and the MUS shrunk from all
+    # the groups (the first one the default enumeration finds) an upper bound.
+    start = time()
+    hard = set(hard)
+    with _subsetSolver((nVars, groups, hard), muser) as csolver:
+
+        def toGroups(subset):
+            return sorted([csolver.soft[i-1] for i in subset] + list(hard))
+
+        bounds = [None]
+        def report(lower, upper):
+            if onBound is not None and bounds[0] != (lower, upper):
+                bounds[0] = (lower, upper)
+                onBound(lower + len(hard), upper + len(hard))
+
+        # upper bound: shrink all the groups to a MUS, if they are unsatisfiable. The shrinking checks the
+        # seed against the map, which the cardinality bound of the low bias map would reject: use an empty map
+        everything = array.array('i', range(1, csolver.n+1))
+        if csolver.check_subset(everything):
+            return None, True
+        csolver.set_msolver(mapsolvers.MinisatMapSolver(csolver.n))
+        best = sorted(csolver.shrink(everything))
+        report(0, len(best))
+
+        msolver = mapsolvers.MinicardMapSolver(csolver.n, bias = False)
+        csolver.set_msolver(msolver)
+
+        while True:
+            if timeout is not None and time() - start > timeout:
+                return toGroups(best), False
+
+            seed = msolver.next_seed()
+            # nothing left to explore, or no unexplored set smaller than the best MUS: the best MUS is minimum
+            if seed is None or len(seed) >= len(best):
+                report(len(best), len(best))
+                return toGroups(best), True
+
+            seed = sorted(seed)
+            if csolver.check_subset(seed):
+                msolver.block_down(csolver.grow(seed))
+                # the unexplored sets have at least k groups
+                report(msolver.k, len(best))
+            else:
+                report(len(seed), len(seed))
+                return toGroups(seed), True
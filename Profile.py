@@ -1,12 +1,106 @@
 # Profile object
 
-from collections import Counter
 from itertools import permutations, product
 from Helpers import sum_to_n, powerset
 from itertools import combinations
-from math import factorial
+from math import factorial, comb
 from random import choice, randint
 from scipy.special import binom
+from hashlib import sha1
+import numpy as np
+
+# Ballots over a set of alternatives, identified by their rank among the m! permutations
+# (in lexicographic order). There is one table per set of alternatives, shared by all the profiles
+# over them: it also interns the ballots, so that all profiles use the same tuple for a ballot.
+# Ranks are computed (and stored) on first use, so the table never holds all m! ballots.
+class BallotTable():
+
+    # sorted alternatives ---> table. Also, as a shortcut, any tuple of the alternatives
+    # (e.g. a ballot) that was already looked up ---> table
+    _tables = {}
+
+    # table of the alternatives (any iterable, e.g. a ballot)
+    @classmethod
+    def of(cls, alternatives):
+        table = cls._tables.get(alternatives) if isinstance(alternatives, tuple) else None
+        if table is None:
+            key = tuple(sorted(alternatives))
+            table = cls._tables.get(key)
+            if table is None:
+                table = cls._tables[key] = cls(key)
+            if isinstance(alternatives, tuple):
+                cls._tables[alternatives] = table
+
+        return table
+
+    def __init__(self, alternatives):
+        self.alternatives = alternatives
+        self.alternativeSet = frozenset(alternatives)
+        self.m = len(alternatives)
+        # alternative ---> its index in the pairwise matrices
+        self.index = {x:i for i, x in enumerate(alternatives)}
+
+        # ballot ---> rank, and rank ---> ballot
+        self._ranks = {}
+        self._ballots = {}
+        # rank ---> pairwise matrix of the ballot
+        self._pairwise = {}
+        # ballot ---> position of each alternative in it
+        self._positions = {}
+
+    def rank(self, ballot):
+        rank = self._ranks.get(ballot)
+        if rank is None:
+            # lehmer code: for each position, how many of the remaining alternatives are smaller
+            remaining = list(self.alternatives)
+            rank = 0
+            for i, x in enumerate(ballot):
+                j = remaining.index(x)
+                rank += j * factorial(self.m - 1 - i)
+                del remaining[j]
+
+            self._ranks[ballot] = rank
+            self._ballots[rank] = ballot
+
+        return rank
+
+    def ballot(self, rank):
+        ballot = self._ballots.get(rank)
+        if ballot is None:
+            # inverse of the lehmer code
+            remaining = list(self.alternatives)
+            ballot, rest = [], rank
+            for i in range(self.m):
+                j, rest = divmod(rest, factorial(self.m - 1 - i))
+                ballot.append(remaining.pop(j))
+
+            ballot = tuple(ballot)
+            self._ranks[ballot] = rank
+            self._ballots[rank] = ballot
+
+        return ballot
+
+    # position of each alternative in a ballot (a dict alternative ---> position, 0 being the top),
+    # so that comparing two alternatives does not need to search the ballot
+    def positions(self, ballot):
+        positions = self._positions.get(ballot)
+        if positions is None:
+            positions = self._positions[ballot] = {x:i for i, x in enumerate(ballot)}
+
+        return positions
+
+    # pairwise matrix of a ballot (given by rank): M[i, j] = 1 iff the i-th alternative is preferred
+    # to the j-th one (indexes as in self.index)
+    def pairwise(self, rank):
+        M = self._pairwise.get(rank)
+        if M is None:
+            M = np.zeros((self.m, self.m), dtype = int)
+            positions = [self.index[x] for x in self.ballot(rank)]
+            for i in range(self.m - 1):
+                M[positions[i], positions[i+1:]] = 1
+            self._pairwise[rank] = M
+
+        return M
 
 class Profile():
 
@@ -28,52 +122,101 @@ class Profile():
             ballots = string.split(',')
             return cls(map(lambda b: tuple(int(x) for x in b), ballots))
 
-    ### NEXT FOUR METHODS:
-    # generate randomly all profiles with n voters and m alterantives
+    ### NEXT METHODS:
+    # enumerate all profiles with n voters and m alterantives, lazily.
+    # A profile with n voters is a multiset of n ballots, i.e. a non-decreasing sequence of
+    # n ballot ranks (see BallotTable) out of m!. Profiles are enumerated in lexicographic order
+    # of these sequences, and are numbered accordingly (from 0): profileAt and profileIndex convert
+    # between profiles and their numbers, so that an enumeration can be resumed or split in slices.
 
     @classmethod
-    def _aux_iterate(cls, n, m):
-        
-        # these are already tuples
-        ballots = {p for p in permutations(range(m))}
+    # number of non-decreasing sequences of length n, with values in a range of size k
+    def _countSequences(cls, n, k):
+        return comb(n + k - 1, n) if k > 0 else int(n == 0)
 
-        if n == 1:
-            return [Counter((ballot,)) for ballot in ballots]
-        else:
-
-            result = []
-
-            for partial in cls._aux_iterate(n-1, m):
-                for ballot in ballots:
-                    new = Counter(partial)
-                    new.update((ballot,))
-                    result.append(new)
+    @classmethod
+    # profile with the ranks of ballots in sequence
+    def _fromRanks(cls, table, sequence):
+        counts = {}
+        for r in sequence:
+            ballot = table.ballot(r)
+            counts[ballot] = counts.get(ballot, 0) + 1
+        return cls(counts)
 
-            return result
+    @classmethod
+    # the index-th profile with n voters and m alternatives
+    def profileAt(cls, index, n, m):
+        K = factorial(m)
+        assert 0 <= index < cls._countSequences(n, K), "Index out of range."
+
+        # pick the ranks one by one: skip all the sequences starting with a smaller rank
+        sequence, r = [], 0
+        for position in range(n):
+            while True:
+                skipped = cls._countSequences(n - position - 1, K - r)
+                if index < skipped:
+                    break
+                index -= skipped
+                r += 1
+            sequence.append(r)
+
+        return cls._fromRanks(BallotTable.of(range(m)), sequence)
 
     @classmethod
-    def _get_iterateAllProfilesInElectorate(cls, n, m):
-        res = set()
-        for p in cls._aux_iterate(n, m):
-            extended_prof = []
-            for b, c in p.items():
-                for _ in range(c):
-                    extended_prof.append(b)
+    # number of the profile among those with the same number of voters and alternatives
+    def profileIndex(cls, profile):
+        K = factorial(profile.getBallotTable().m)
+        sequence = [r for r, c in profile.getKey() for _ in range(c)]
+        n = len(sequence)
 
-            res.add(tuple(sorted(extended_prof)))
+        index, previous = 0, 0
+        for position, r in enumerate(sequence):
+            # sequences with the same beginning, and a smaller rank here
+            for smaller in range(previous, r):
+                index += cls._countSequences(n - position - 1, K - smaller)
+            previous = r
 
-        return res
+        return index
 
     @classmethod
-    def iterateAllProfilesInElectorate(cls, n, m):
-        for p in cls._get_iterateAllProfilesInElectorate(n, m):
-            yield cls(p)
-                
+    # all profiles with n voters (m alternatives), from the start-th to the (stop-1)-th (stop = None ---> to the end).
+    # Only the current profile is kept in memory.
+    def iterateAllProfilesInElectorate(cls, n, m, start = 0, stop = None):
+        K = factorial(m)
+        total = cls._countSequences(n, K)
+        stop = total if stop is None else min(stop, total)
+        if start >= stop:
+            return
+
+        table = BallotTable.of(range(m))
+        sequence = [r for r, c in cls.profileAt(start, n, m).getKey() for _ in range(c)]
+
+        for _ in range(start, stop):
+            yield cls._fromRanks(table, sequence)
+
+            # next sequence: increase the last rank that can be increased, and
+            # set all the following ones to it
+            i = n - 1
+            while i >= 0 and sequence[i] == K - 1:
+                i -= 1
+            if i < 0:
+                break
+            sequence[i:] = [sequence[i] + 1] * (n - i)
+
     @classmethod
-    def iterateAllProfiles(cls, n, m):
+    # all profiles with 1 up to n voters (m alternatives), numbered in this order (first those with one voter, etc.),
+    # from the start-th to the (stop-1)-th (stop = None ---> to the end)
+    def iterateAllProfiles(cls, n, m, start = 0, stop = None):
+        K = factorial(m)
+        offset = 0
         for electorate in range(1, n+1):
-            for p in cls._get_iterateAllProfilesInElectorate(electorate, m):
-                yield cls(p)
+            size = cls._countSequences(electorate, K)
+            if stop is not None and stop <= offset:
+                break
+            if start < offset + size:
+                yield from cls.iterateAllProfilesInElectorate(electorate, m, max(start - offset, 0), \
+                    None if stop is None else stop - offset)
+            offset += size
     
     ####
 
@@ -140,6 +283,11 @@ class Profile():
 
         return cls(profile)
 
+    # profiles are the most numerous objects around (sets of profiles in GraphGen, the mapping in
+    # SATEncoding, references in every instance): no __dict__, and only the canonical key is stored
+    # eagerly. Other attributes are lazily created, when (if) needed.
+    __slots__ = ('_table', '_key', '_length', '_hash', '_profile', '_string', '_allBallots', '_canonical', '_support')
+
     def __init__(self, profile):
 
         # profile can either be a dict (ballot->count)
@@ -147,63 +295,77 @@ class Profile():
         # a ballot is a tuple of alternatives
         # e.g. tuple (2, 1, 0) means 2>1>0
 
-        # self._profile ---> map from ballots to counts (of votes)
+        # self._table ---> BallotTable of the alternatives (shared by all profiles over them)
+        # self._key -----> sorted tuple of pairs (rank of ballot, count): identifies the profile
         # self._length ----> # voters
-        # self._A  -----> alts
 
         if isinstance(profile, dict):
-            self._profile = {b:c for b,c in profile.items() if c > 0}
-            self._length = sum(profile.values())
-            self._A = set(list(profile.keys())[0])
+            counts = {b:c for b,c in profile.items() if c > 0}
         else:
-            self._profile = {}
-            self._length = 0
-            self._A = None
-
+            counts = {}
             for ballot in profile:
-
-                self._length += 1
-
-                # init alternatives
-                if self._A is None:
-                    self._A = set(ballot)
-
-                if ballot in self._profile:
-                    self._profile[ballot] += 1
+                if ballot in counts:
+                    counts[ballot] += 1
                 else:
-                    self._profile[ballot] = 1
+                    counts[ballot] = 1
+
+        self._table = BallotTable.of(next(iter(counts)))
+        self._key = tuple(sorted((self._table.rank(ballot), c) for ballot, c in counts.items()))
+        self._length = sum(counts.values())
+        self._hash = hash(self._key)
 
         # these values are costly to create; will be created only if needed
         # (lazy evaluation)
 
-        # hash code
-        self._hash = None
+        # map from ballots to counts (of votes)
+        self._profile = None
         # profile to string
         self._string = None
         # all the ballots (with repetitions!)
         self._allBallots = None
+        # canonical representative up to neutrality, and relabelling to it
+        self._canonical = None
+        # pairwise support matrix (see getSupportMatrix)
+        self._support = None
+
+    # pickle (e.g. for InstanceCache, or to send to other processes) only the
+    # alternatives and the key: the rest is rebuilt when needed
+    def __getstate__(self):
+        return self._table.alternatives, self._key, self._length
+
+    def __setstate__(self, state):
+        alternatives, self._key, self._length = state
+        self._table = BallotTable.of(alternatives)
+        self._hash = hash(self._key)
+        self._profile, self._string, self._allBallots, self._canonical, self._support = None, None, None, None, None
+
+    # sorted tuple of pairs (rank of ballot, count), ranks being those of getBallotTable()
+    def getKey(self):
+        return self._key
+
+    def getBallotTable(self):
+        return self._table
+
+    # map from ballots to counts, in order of rank
+    def _getProfile(self):
+        # if it does not exist, create it first
+        if self._profile is None:
+            self._profile = {self._table.ballot(r):c for r, c in self._key}
+
+        return self._profile
 
     # in this ballot, x > y?
     def prefers(self, ballot, x, y):
-        return ballot.index(x) < ballot.index(y)
+        positions = self._table.positions(ballot)
+        return positions[x] < positions[y]
 
     # top within alternatives O according to a ballot
     def getTopOf(self, ballot, O):
-        top = None
-        for x in O:
-            if top is None or self.prefers(ballot, x, top):
-                top = x
-
-        return top
+        return min(O, key = self._table.positions(ballot).__getitem__, default = None)
 
     # bottom within alternatives O according to a ballot
     def getBottomOf(self, ballot, O):
-        bottom = None
-        for x in O:
-            if bottom is None or self.prefers(ballot, bottom, x):
-                bottom = x
-
-        return bottom
+        return max(O, key = self._table.positions(ballot).__getitem__, default = None)
 
     # stringify a ballot
     def _ballotToString(self, ballot):
@@ -213,14 +375,15 @@ class Profile():
     def toString(self):
         # if it does not exist, create it first
         if self._string is None:
-            self._string = ", ".join((f"#{c}:"+self._ballotToString(ballot) \
-                for ballot, c in sorted(self._profile.items(),)))
+            # ballots are ranked in lexicographic order: the key is already sorted
+            self._string = ", ".join((f"#{c}:"+self._ballotToString(self._table.ballot(r)) \
+                for r, c in self._key))
 
         return self._string
 
     def getCounts(self):
         # get the unique counts (i.e. all numbers of ballots)
-        return self._profile.values()
+        return self._getProfile().values()
 
     # top according to ballot
     def top(self, ballot):
@@ -228,19 +391,19 @@ class Profile():
 
     # rank of x in ballot
     def rank(self, ballot, x):
-        return ballot.index(x)
+        return self._table.positions(ballot)[x]
 
     def getAlternatives(self):
-        return self._A
+        return self._table.alternativeSet
 
     def uniqueBallots(self):
-        return self._profile.keys()
+        return self._getProfile().keys()
 
     def allBallots(self):
         # if it does not exist, create it first
         if self._allBallots is None:
             self._allBallots = []
-            for ballot, count in self._profile.items():
+            for ballot, count in self._getProfile().items():
                 self._allBallots += [ballot for _ in range(count)]
 
         # ballots w/ repetitions
@@ -248,7 +411,7 @@ class Profile():
 
     # return list of pairs of form (ballot, count)
     def getTuples(self):
-        return self._profile.items()
+        return self._getProfile().items()
 
     # are this profile and profile "other" equivalent, up to neutrality?
     def isNeutralityEq(self, other):
@@ -275,7 +438,7 @@ class Profile():
         for a in self.getAlternatives():
             scores[a] = 0
             for b, c in self.getTuples():
-                scores[a] += c * (len(self.getAlternatives()) - b.index(a) - 1)
+                scores[a] += c * (len(self.getAlternatives()) - self.rank(b, a) - 1)
 
         bestscore, winners = float("-inf"), set()
         for a, score in scores.items():
@@ -293,7 +456,7 @@ class Profile():
         for a in self.getAlternatives():
             scores[a] = 0
             for b, c in self.getTuples():
-                scores[a] += c * (len(self.getAlternatives()) - b.index(a) - 1)
+                scores[a] += c * (len(self.getAlternatives()) - self.rank(b, a) - 1)
 
         # get binary relations...
         bin_order = set()
@@ -308,13 +471,26 @@ class Profile():
 
         return bin_order
 
+    # weighted pairwise preference matrix: S[i, j] = number of voters preferring the i-th alternative
+    # to the j-th one (in sorted order of the alternatives). Computed once, and shared by all the
+    # majority-based checks below.
+    def getSupportMatrix(self):
+        # if it does not exist, create it first
+        if self._support is None:
+            self._support = sum(c * self._table.pairwise(r) for r, c in self._key)
+
+        return self._support
+
+    # number of voters preferring x to y
+    def getSupport(self, x, y):
+        return int(self.getSupportMatrix()[self._table.index[x], self._table.index[y]])
+
     # get copeland winner
     def getCopeland(self):
         scores = {a:0 for a in self.getAlternatives()}
 
         for x, y in combinations(self.getAlternatives(), 2):
-            prefers_x = sum(count for b, count in self.getTuples() if self.prefers(b, x, y))
-            prefers_y = sum(count for b, count in self.getTuples() if self.prefers(b, y, x))
+            prefers_x, prefers_y = self.getSupport(x, y), self.getSupport(y, x)
 
             if prefers_x > prefers_y:
                 scores[x] += 1
@@ -336,8 +512,7 @@ class Profile():
         MG = set()
 
         for x, y in combinations(self.getAlternatives(), 2):
-            prefers_x = sum(count for b, count in self.getTuples() if self.prefers(b, x, y))
-            prefers_y = sum(count for b, count in self.getTuples() if self.prefers(b, y, x))
+            prefers_x, prefers_y = self.getSupport(x, y), self.getSupport(y, x)
 
             if prefers_x > prefers_y:
                 MG.add((x, y))
@@ -365,51 +540,115 @@ class Profile():
 
     def getCondorcet(self):
 
-        for c in self.getAlternatives():
-            flag = True
-            for x in self.getAlternatives():
-                if c != x:
-                    prefers_c = sum(count for b, count in self.getTuples() if self.prefers(b, c, x))
-                    if prefers_c <= len(self)/2:
-                        flag = False
-                        break
-            if flag:
-                return c
+        # the condorcet winner beats every other alternative by a strict majority
+        beats = 2 * self.getSupportMatrix() > len(self)
+        winners = np.flatnonzero(beats.sum(axis = 1) == self._table.m - 1)
 
-        return None
+        return self._table.alternatives[winners[0]] if len(winners) else None
 
     # has this profile some pareto-dom alternative?
     def hasPareto(self):
-        for x in self._A:
+        for x in self.getAlternatives():
             if self.isPareto(x):
                 return True
 
         return False
 
-    # is x pareto dominated?
+    # is x pareto dominated? (i.e. some y is preferred to x by every voter)
     def isPareto(self, x):
-        for y in self._A:
-            if x != y:
-                flag = True
-                for ballot in self.uniqueBallots():
-                    if self.prefers(ballot, x, y):
-                        flag = False
-                        break
-                if flag:
-                    return True
-        return False
+        return bool((self.getSupportMatrix()[:, self._table.index[x]] == len(self)).any())
 
     # does every pair tie in a pairwise comparison?
     def isCancellation(self):
         if len(self) % 2 != 0:
             return False
 
-        for x, y in combinations(self._A, 2):
-            prefers_x = sum([count for ballot, count in self.getTuples() if self.prefers(ballot, x, y)])
-            if prefers_x != (len(self) / 2):
-                return False
+        # off the diagonal, every entry must be n/2 (the diagonal is 0)
+        S = self.getSupportMatrix()
+        return bool(((2 * S == len(self)) | np.eye(self._table.m, dtype = bool)).all())
 
-        return True
+    # find a cancellation profile obtained from this one by lowering x (or raising it, if not down)
+    # by any number of positions in the ballots of some voters. Returns it, or None if there is none.
+    def findCancellationByShifting(self, x, down = True):
+        if len(self) % 2 != 0:
+            return None
+
+        half = len(self) // 2
+        others = [y for y in self._table.alternatives if y != x]
+
+        # moving x past y only changes the support of x against y: the other pairs must already tie
+        for y, z in combinations(others, 2):
+            if 2 * self.getSupport(y, z) != len(self):
+                return None
+
+        # demand[i]: number of voters that must move x past others[i], to make them tie
+        demand = tuple((self.getSupport(x, y) - half) if down else (half - self.getSupport(x, y)) for y in others)
+        if min(demand, default = 0) < 0:
+            return None
+
+        # for each ballot (and its count), the alternatives x moves past, in order, as indexes in others:
+        # moving x by k positions moves it past the first k of them.
+        where = {y:i for i, y in enumerate(others)}
+        ballots = []
+        for ballot, count in self.getTuples():
+            position = self.rank(ballot, x)
+            passed = ballot[position+1:] if down else ballot[position-1::-1] if position > 0 else ()
+            ballots.append((ballot, count, [where[y] for y in passed]))
+
+        # the voters of a ballot, moving x, pass the first alternative at least as often as the second, etc.:
+        # their choice is a non-increasing sequence of numbers of voters passing each alternative in order.
+        def sequences(count, passed, demand, j = 0):
+            if j == len(passed):
+                yield ()
+                return
+            for a in range(min(count, demand[passed[j]]), -1, -1):
+                if a == 0:
+                    yield (0,) * (len(passed) - j)
+                else:
+                    for rest in sequences(a, passed, demand, j+1):
+                        yield (a,) + rest
+
+        # search over the ballots, with the demand still to satisfy. States that failed are memorised:
+        # there are at most (n/2+1)^(m-1) demands per ballot.
+        failed = set()
+
+        def search(i, demand):
+            if i == len(ballots):
+                return [] if not any(demand) else None
+            if (i, demand) in failed:
+                return None
+
+            _, count, passed = ballots[i]
+            for sequence in sequences(count, passed, demand):
+                rest = list(demand)
+                for j, a in zip(passed, sequence):
+                    rest[j] -= a
+                choices = search(i+1, tuple(rest))
+                if choices is not None:
+                    return [sequence] + choices
+
+            failed.add((i, demand))
+            return None
+
+        choices = search(0, demand)
+        if choices is None:
+            return None
+
+        # build the profile: of the voters of a ballot, sequence[k-1] - sequence[k] move x by k positions
+        shifted = {}
+        for (ballot, count, passed), sequence in zip(ballots, choices):
+            sequence = (count,) + sequence + (0,)
+            position = self.rank(ballot, x)
+            for k in range(len(passed) + 1):
+                voters = sequence[k] - sequence[k+1]
+                if voters > 0:
+                    new_ballot = list(ballot)
+                    del new_ballot[position]
+                    new_ballot.insert(position + k if down else position - k, x)
+                    new_ballot = tuple(new_ballot)
+                    shifted[new_ballot] = shifted.get(new_ballot, 0) + voters
+
+        return Profile(shifted)
 
     # is this profile unanimous (w.r.t. some top alternative)?
     def isUnanymous(self):
@@ -425,19 +664,20 @@ class Profile():
     # check if single peaked. Can give a default dim, or check m! all.
     def isSinglePeaked(self, dim = None):
 
-        # check wheter, given a dimension, y is between x and z.
-        isGreater = lambda dim, x, y : dim.index(x) < dim.index(y)
-        checkOrder = lambda dim, x, y, z: isGreater(dim, x, y) and isGreater(dim, y, z)
+        # check wheter, given a dimension (as positions), y is between x and z.
+        checkOrder = lambda dim, x, y, z: dim[x] < dim[y] and dim[y] < dim[z]
         isBetween = lambda dim, x, y, z: checkOrder(dim, x, y, z) or checkOrder(dim, z, y, x)
 
         # check wheter all ballots satisfy that, for ordered all pairs of alternatives,
         # singlepeakedness holds
         def checkDim(dim):
+            dim = self._table.positions(tuple(dim))
             for ballot in self.uniqueBallots():
+                positions = self._table.positions(ballot)
                 for x in self.getAlternatives():
                     for y in self.getAlternatives():
                         if isBetween(dim, y, x, self.top(ballot)):
-                            if not self.prefers(ballot, x, y):
+                            if not positions[x] < positions[y]:
                                 return False
             return True
 
@@ -450,26 +690,54 @@ class Profile():
         else:
             return checkDim(dim)
 
-    # has code
-    def __hash__(self):
+    # canonical representative of this profile up to neutrality (i.e. up to relabelling the alternatives):
+    # two profiles have the same one iff they are linked by neutrality.
+    # Returns the pair (canonical profile, mapping), where mapping relabels the alternatives of this
+    # profile into those of the canonical one.
+    def canonical(self):
         # if it does not exist, create it first
-        if self._hash is None:
-            self._hash = hash(frozenset(self._profile.items()))
+        if self._canonical is None:
+            # the canonical profile is the relabelling with the smallest sorted list of (ballot, count).
+            # Its first ballot is then 0>1>...>m-1, so we only need to try the relabellings that map
+            # some ballot of the profile to it (one per unique ballot), instead of all m! of them.
+            alternatives = self._table.alternatives
+            best, best_mapping = None, None
+            for ballot in self.uniqueBallots():
+                mapping = {x:y for x, y in zip(ballot, alternatives)}
+                relabelled = sorted((tuple(mapping[x] for x in b), c) for b, c in self.getTuples())
+                if best is None or relabelled < best:
+                    best, best_mapping = relabelled, mapping
+
+            canonical = Profile(dict(best))
+            if canonical == self:
+                canonical = self
+            else:
+                canonical._canonical = (canonical, {x:x for x in alternatives})
 
+            self._canonical = (canonical, best_mapping)
+
+        return self._canonical
+
+    # stable identifier of the profile (the same in every run, unlike the hash code)
+    def fingerprint(self):
+        return sha1(self.toString().encode()).hexdigest()
+
+    # has code (precomputed)
+    def __hash__(self):
         return self._hash
 
     def __len__(self):
         return self._length
 
-    # equal if the mappings are
+    # equal if the keys (and alternatives) are
     def __eq__(self, other):
-        return self._profile == other._profile
+        return self._key == other._key and self._table is other._table
 
     def __lt__(self, other):
         # only for technical purposes, i.e. avoiding
         # doubles in loops (when parsing all profiles, only consider
-        # each pair once)
-        return self.toString() < other.toString()
+        # each pair once). Same order as the strings, for profiles with the same voters
+        return self._key < other._key
 
     # transform a ballot in formal order: set of tuples
     def _preference2binary(self, ballot):
@@ -484,10 +752,11 @@ class Profile():
         # kendall tau
         # 0.5 |{(x, y) : x R1 y and y R2 x}|
         score = 0
+        positions1, positions2 = self._table.positions(b1), self._table.positions(b2)
         for x in self.getAlternatives():
             for y in self.getAlternatives():
                 if x != y:
-                    if self.prefers(b1, x, y) and self.prefers(b2, y, x):
+                    if positions1[x] < positions1[y] and positions2[y] < positions2[x]:
                         score += 1
         return 0.5 * score
 
@@ -0,0 +1,76 @@
+# Columnar table of profiles (e.g. a level of the BFS in GraphGen), to check the
+# intraprofile axioms on all of them at once, instead of one profile at a time.
+#
+# The profiles are stored as a NumPy count matrix: one row per profile, one column
+# per ballot (only the ballots that occur in some profile of the table), entry = number
+# of voters with that ballot. Majority-based predicates come from a single matrix
+# product with the pairwise indicator matrices of the ballots (see BallotTable.pairwise).
+
+import numpy as np
+
+class ProfileTable():
+
+    # profiles: list of Profile objects, over the same alternatives
+    def __init__(self, profiles):
+
+        self.profiles = list(profiles)
+
+        self._ballots = self.profiles[0].getBallotTable() if self.profiles else None
+        m = 0 if self._ballots is None else self._ballots.m
+        self.alternatives = () if self._ballots is None else self._ballots.alternatives
+
+        # columns: the ranks occurring in the table
+        ranks = sorted({r for profile in self.profiles for r, _ in profile.getKey()})
+        column = {r:j for j, r in enumerate(ranks)}
+
+        self.counts = np.zeros((len(self.profiles), len(ranks)), dtype = np.int64)
+        for i, profile in enumerate(self.profiles):
+            assert profile.getBallotTable() is self._ballots, "All the profiles must have the same alternatives."
+            for r, c in profile.getKey():
+                self.counts[i, column[r]] = c
+
+        # pairwise indicator of each ballot type: row j, entry x*m+y = 1 iff ballot j puts x above y
+        self._pairwise = np.array([self._ballots.pairwise(r).ravel() for r in ranks], dtype = np.int64).reshape(len(ranks), m * m)
+
+        # number of voters of each profile
+        self.lengths = self.counts.sum(axis = 1)
+
+        # lazily created
+        self._supports = None
+
+    def __len__(self):
+        return len(self.profiles)
+
+    # S[i, x, y] = number of voters of the i-th profile preferring x to y (indexes of the alternatives)
+    def getSupports(self):
+        if self._supports is None:
+            m = len(self.alternatives)
+            self._supports = (self.counts @ self._pairwise).reshape(len(self.profiles), m, m)
+
+        return self._supports
+
+    # Condorcet winner of each profile (None if there is none)
+    def getCondorcet(self):
+        m = len(self.alternatives)
+        beats = 2 * self.getSupports() > self.lengths[:, None, None]
+        isWinner = beats.sum(axis = 2) == m - 1
+
+        winners = [None] * len(self.profiles)
+        for i, x in zip(*np.nonzero(isWinner)):
+            winners[i] = self.alternatives[x]
+
+        return winners
+
+    # D[i, x] = True iff x is Pareto-dominated in the i-th profile (some y is preferred to x by every voter)
+    def getParetoDominated(self):
+        return (self.getSupports() == self.lengths[:, None, None]).any(axis = 1)
+
+    # is each profile a cancellation profile (every pair of alternatives ties)?
+    def isCancellation(self):
+        m = len(self.alternatives)
+        ties = (2 * self.getSupports() == self.lengths[:, None, None]) | np.eye(m, dtype = bool)
+        return (self.lengths % 2 == 0) & ties.all(axis = (1, 2))
+
+    # has each profile a single voter?
+    def isSingleton(self):
+        return self.lengths == 1
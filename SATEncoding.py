@@ -2,86 +2,218 @@
 
 
 from Profile import Profile
+from Axioms.InterAxioms.Neutrality import Neutrality
+from MUSExtractor import enumerateMUSes, smallestMUS
+from Helpers import GMUS_FOLDER
+import os
 import subprocess
+import gzip
+import math
+import numpy as np
+import tempfile
 
 class SATEncoding():
 
-    def __init__(self, profiles, A):
+    # the gcnf file (see _dumpGroupCNF) is written in chunks of this many clauses
+    DUMP_CHUNK = 1 << 16
+    # name of the gcnf file passed to marco (in a temporary folder). Set it to 'dump.gcnf.gz'
+    # to gzip it: much smaller, a bit slower to write
+    DUMP_NAME = 'dump.gcnf'
+
+    # quotient: the profiles are canonical representatives up to neutrality (see Profile.canonical),
+    # and every other profile shares the variables of its representative, relabelled. This way,
+    # neutrality holds implicitly, without any Neutrality instance.
+    def __init__(self, profiles, A, quotient = False):
         self.mapping = {}
         self.A = A
+        self.quotient = quotient
+
+        # number of propositional variables used so far. Besides the (profile, alternative)
+        # variables, there are selector variables, used to switch groups of clauses on and off
+        # in an incremental SAT solver. All of them share the same numbering.
+        self.nbVariables = 0
+        self.selectors = {}
+
+        self.addProfiles(profiles)
+
+    # fresh propositional variable
+    def newVariable(self):
+        self.nbVariables += 1
+        return self.nbVariables
+
+    # selector variable for some key (e.g. an outcome): created on first use
+    def getSelector(self, key):
+        if key not in self.selectors:
+            self.selectors[key] = self.newVariable()
+        return self.selectors[key]
 
-        # mapping from (profile, alternative) ---> propositional variable (non-zero integer index.)
+    # mapping from (profile, alternative) ---> propositional variable (non-zero integer index.)
+    # profiles that already have variables keep them: this way, the clauses encoded so far
+    # stay valid when the graph grows.
+    def addProfiles(self, profiles):
         for profile in profiles:
-            for x in self.A:
-                self.mapping[(profile, x)] = len(self.mapping) + 1
+            if (profile, next(iter(self.A))) not in self.mapping:
+                for x in self.A:
+                    self.mapping[(profile, x)] = self.newVariable()
 
     def getLiteral(self, profile, x):
-        # get propositional var
-        return self.mapping[(profile, x)]
+        # in the quotient, x wins in profile iff its relabelling wins in the representative
+        if self.quotient:
+            profile, mapping = profile.canonical()
+            x = mapping[x]
+
+        # get propositional var. Profiles get their variables when first needed
+        # (the instances are encoded while the graph is generated, see ClauseSink)
+        try:
+            return self.mapping[(profile, x)]
+        except KeyError:
+            self.addProfiles([profile])
+            return self.mapping[(profile, x)]
 
     # Auxiliary function called from getJustification
     # (might want to check that one first):
-    # from the SAT encoding of the instances 
-    # creates a file that the gMUS extractor
-    # can understand.
-    def _dumpGroupCNF(self, instance2clauses):
+    # from the clauses of the instances (a ClauseSink, plus the goal clauses)
+    # creates a file (at path filename) that the gMUS extractor
+    # can understand. If filename ends with .gz, the file is gzipped (marco reads it as well).
+    def _dumpGroupCNF(self, sink, goal_clauses, filename):
 
-        # first, we associates to each instance, an index.
+        # the group of an instance is its ID + 1, because somehow ID=0 is not handled by MARCO
+        # (gMUS extractor), so we need to start from 1. Will need to pay attention to this while
+        # extracting the output
 
-        index2inst = list(instance2clauses.keys())
-        # index + 1 because somehow ID=0 is not handled by MARCO (gMUS extractor), 
-        # so we need to start from 1. Will need to pay attention to this while extacting
-        # the output
-        inst2index = {index2inst[index]:index+1 for index in range(len(index2inst))}
+        n, nbGroups = self.nbVariables, len(sink)
 
-        with open('dump.gcnf', 'w') as file:
+        # the file is a sequence of tokens: literals (each followed by a space), starts of lines
+        # ("{ID+1} " for a clause of group ID) and ends of lines ("0\n"). The text of token t is
+        # fragments[t]: literal l is fragments[l] (negative ones count from the end of the list,
+        # as python does), start of group ID is fragments[START+ID], end of line is fragments[END].
+        fragments = [b"%d " % l for l in range(n+1)] + [b"{%d} " % (ID+1) for ID in range(nbGroups)] \
+            + [b"0\n"] + [b"%d " % l for l in range(-n, 0)]
+        START, END = n+1, n+1+nbGroups
+        text = fragments.__getitem__
 
-            # number of propositional vars, group of clauses (=instance) and of clauses in total
-            nbVariables = len(self.mapping)
-            nbGroups = len(instance2clauses)
-            nbClauses   = 0
-            for clauses in instance2clauses.values():
-                nbClauses += len(clauses)
+        if filename.endswith('.gz'):
+            # fastest compression: the file is read once, right away
+            file = gzip.open(filename, 'wb', compresslevel = 1)
+        else:
+            file = open(filename, 'wb')
 
+        with file:
+            # file header: number of propositional vars, of clauses in total and of groups of clauses (=instances)
+            nbClauses = sink.nbClauses() + len(goal_clauses)
+            file.write(b"p gcnf %d %d %d\n" % (n, nbClauses, nbGroups))
 
-            # file header
-            file.write("p gcnf " + str(nbVariables) + " " + str(nbClauses) + " " + str(nbGroups) + "\n")
+            # the goal clauses are not in the sink (lines can be in any order: the group is on the line)
+            for clause in goal_clauses:
+                file.write(fragments[START+sink.goalID] + b"".join(map(text, clause)) + b"0\n")
 
+            # the clauses of the sink, DUMP_CHUNK at a time: we lay out their tokens with numpy,
+            # straight from the arrays of the sink, then turn them into text and write them at once.
+            literals = np.frombuffer(sink.literals, dtype = np.int32)
+            offsets = np.frombuffer(sink.clauseOffsets, dtype = np.int64)
+            # group ID of each clause
+            groups = np.repeat(np.arange(nbGroups), np.diff(np.frombuffer(sink.groupOffsets, dtype = np.int64)))
 
-            goal_index = None
-            for instance, clauses in instance2clauses.items():
-                # extract the goal index, we will need to return this
-                if instance.axiomName() == 'Goal':
-                    goal_index = inst2index[instance]
-                
-                # encode each instance (group of clauses)
-                for clause in clauses:
-                    line = "{" + str(inst2index[instance]) + "} "
-                    for literal in clause:
-                        line += str(literal) + " "
-                    line += "0 \n"
-                    file.write(line)
+            for first in range(0, sink.nbClauses(), self.DUMP_CHUNK):
+                last = min(first + self.DUMP_CHUNK, sink.nbClauses())
+                bounds = offsets[first:last+1] - offsets[first]
 
-        # write file... and return the mapping from index to instance and the goal index
-        # (we will need these to read the output of the gMUS extractor)
+                # clause c takes bounds[c+1]-bounds[c] literals, plus start and end of line
+                tokens = np.empty(bounds[-1] + 2*(last-first), dtype = np.int64)
+                starts = bounds[:-1] + 2*np.arange(last-first)
+                ends = bounds[1:] + 2*np.arange(last-first) + 1
 
-        return index2inst, goal_index
+                isLiteral = np.ones(len(tokens), dtype = bool)
+                isLiteral[starts] = isLiteral[ends] = False
 
-    # function to extract the justifications
-    # accept a mapping from instance to sat encoding and limit (<- number of gMUSes to extract)
-    def getJustification(self, instance2clauses, limit = 1):
-        # this function create a file called dump.gcnf, containing all the info for the gMUS extraction
-        # furthermore, returns data useful to read the output of the gMUS extractor
-        index2inst, goal_index = self._dumpGroupCNF(instance2clauses)
+                tokens[starts] = START + groups[first:last]
+                tokens[ends] = END
+                tokens[isLiteral] = literals[offsets[first]:offsets[last]]
 
-        # call the gMUS searcher (marco)
+                file.write(b"".join(map(text, tokens.tolist())))
 
-        if limit != -1:
-            command = ["gMUS/marco.py", "-v", "--parallel", "MUS,MUS,MUS,MUS,MUS,MUS,MUS,MUS", "-l", str(limit), "dump.gcnf"]
-        else:
-            command = ["gMUS/marco.py", "-v", "--parallel", "MUS,MUS,MUS,MUS,MUS,MUS,MUS,MUS", "dump.gcnf"]
+    # turn a gMUS (list of group IDs of the sink) into a justification: normative basis and explanation
+    def _toJustification(self, records, listIDs):
+        # turn the IDs to the corresponding instances
+        # given an Instance object, getExplanation() returns some text to be used in the explanation
+        explanation = [records[ID].getExplanation() for ID in listIDs]
+
+        # normative basis: simply set of axioms we use
+        normative = set()
+        for ID in listIDs:
+            normative.update(records[ID].normativeBasis())
+
+        # in the quotient, the instances may talk about profiles that are not representatives:
+        # we lift the explanation back to them, making explicit the neutrality links that
+        # the encoding used implicitly.
+        if self.quotient:
+            links = set()
+            for ID in listIDs:
+                for profile in records[ID].getProfiles():
+                    canonical, mapping = profile.canonical()
+                    if canonical != profile:
+                        links.add(Neutrality(canonical, profile, {y:x for x, y in mapping.items()}))
+
+            explanation += sorted(link.getExplanation() for link in links)
+            for link in links:
+                normative.update(link.normativeBasis())
+
+        return normative, explanation
+
+    # extract justifications with the in-process gMUS extractor:
+    # the instances are passed as groups of clauses, no file is written.
+    # budget: stop enumerating when it runs out (keeping the gMUSes found so far)
+    def _inprocessJustifications(self, sink, goal_clauses, limit, budget = None):
+
+        # the goal is a hard group: we only care about gMUSes containing it
+        MUSes = enumerateMUSes(sink.getGroups(goal_clauses), self.nbVariables, \
+            limit = None if limit == -1 else limit, hard = [sink.goalID])
+
+        justifications = []
+        for listIDs in MUSes:
+            justifications.append(self._toJustification(sink.records, listIDs))
+            # (no need to check the budget after the last one)
+            if len(justifications) == limit or (budget is not None and budget.exceeded() is not None):
+                break
 
-        process = subprocess.run(command, stdout=subprocess.PIPE)
+        return justifications
+
+    # extract a justification of minimum size (in instances) with the in-process gMUS extractor,
+    # instead of picking the smallest of the first few gMUSes. timeout and onBound: see smallestMUS
+    # (after timeout seconds, we keep the smallest one found so far).
+    def _smallestJustification(self, sink, goal_clauses, timeout = None, onBound = None):
+
+        listIDs, _ = smallestMUS(sink.getGroups(goal_clauses), self.nbVariables, hard = [sink.goalID], \
+            timeout = timeout, onBound = onBound)
+
+        return [] if listIDs is None else [self._toJustification(sink.records, listIDs)]
+
+    # extract justifications by running the gMUS extractor (marco) in a subprocess,
+    # with 8 parallel MUS enumerators. timeout: seconds allowed to marco (None ---> no limit)
+    def _marcoJustifications(self, sink, goal_clauses, limit, timeout = None):
+
+        # the file is written in a fresh temporary folder, deleted afterwards: this way,
+        # several justifications can run at the same time (even in the same working directory).
+        # marco recognises the format from the extension, hence the name.
+        with tempfile.TemporaryDirectory(prefix = 'justify-') as folder:
+            filename = os.path.join(folder, self.DUMP_NAME)
+
+            # this function create a file called dump.gcnf, containing all the info for the gMUS extraction
+            self._dumpGroupCNF(sink, goal_clauses, filename)
+
+            # call the gMUS searcher (marco)
+            marco = os.path.join(GMUS_FOLDER, 'marco.py')
+
+            if limit != -1:
+                command = [marco, "-v", "--parallel", "MUS,MUS,MUS,MUS,MUS,MUS,MUS,MUS", "-l", str(limit), filename]
+            else:
+                command = [marco, "-v", "--parallel", "MUS,MUS,MUS,MUS,MUS,MUS,MUS,MUS", filename]
+
+            # marco takes whole seconds (and prints the gMUSes found until then)
+            if timeout is not None:
+                command[1:1] = ["-T", str(max(math.ceil(timeout), 1))]
+
+            process = subprocess.run(command, stdout=subprocess.PIPE)
 
         outputSolver = process.stdout.decode('utf-8')
         lines = [line for line in outputSolver.split("\n") if len(line) != 0 and line[0] == 'U'] # Only get MUSes
@@ -94,23 +226,37 @@ class SATEncoding():
             # get indexes of clauses in gMUS
             listIDs = [tmp for tmp in line.split(" ")]
             listIDs = listIDs[1:] # Remove 'U' to only keep IDs
-            # -1 because I had to add 1 to the indexes, see above when generating the mapping! in self._dumpGroupCNF()
+            # -1 because I had to add 1 to the IDs, see above in self._dumpGroupCNF()
             listIDs = [int(id)-1 for id in listIDs]
 
-            # if goal_index not in the gMUS, then we do not care about this gMUS
-            # (again, -1 because of indexing problems, see above)
-            if goal_index-1 in listIDs:
-                # turn the indexes to the corresponding instances by the index2inst structure
-                # given an Instance object, getExplanation() returns some text to be used in the explanation
-                explanation = [index2inst[ID].getExplanation() for ID in listIDs]
-
-                # normative basis: simply set of axioms we use
-                normative = set()
-                for ID in listIDs:
-                	normative.update(index2inst[ID].normativeBasis())
+            # if the goal is not in the gMUS, then we do not care about this gMUS
+            if sink.goalID in listIDs:
                 # ok, done!
-                justifications.append((normative, explanation))
+                justifications.append(self._toJustification(sink.records, listIDs))
+
+        return justifications
+
+    # function to extract the justifications
+    # accept the encoded instances (a ClauseSink), the clauses of the goal instance (for the outcome
+    # we want to justify) and limit (<- number of gMUSes to extract)
+    # inprocess: use the in-process gMUS extractor (otherwise, run marco in parallel in a subprocess)
+    # smallest: find a gMUS of minimum size instead (in-process; limit and inprocess are ignored),
+    # giving up on proving it minimum after timeout seconds. onBound(lower, upper) is called as the
+    # bounds on its size improve.
+    # budget: a Budget. When it runs out, we keep the gMUSes found so far
+    def getJustification(self, sink, goal_clauses, limit = 1, inprocess = True, smallest = False, timeout = None, onBound = None, \
+        budget = None):
+
+        remaining = None if budget is None else budget.remaining()
 
+        if smallest:
+            if remaining is not None:
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            justifications = self._smallestJustification(sink, goal_clauses, timeout, onBound)
+        elif inprocess:
+            justifications = self._inprocessJustifications(sink, goal_clauses, limit, budget)
+        else:
+            justifications = self._marcoJustifications(sink, goal_clauses, limit, remaining)
 
         # if we found at least one gMUS with the GOAL inside:
         if justifications:
@@ -125,4 +271,3 @@ class SATEncoding():
         # else, sorry.
         else:
             return None, None
-
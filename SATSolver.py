@@ -0,0 +1,117 @@
+# Incremental SAT solving session.
+#
+# The clauses of the instances are loaded once, and only new clauses are appended
+# afterwards (e.g. when the instance graph grows by one depth). Clauses that must be
+# switched on and off between calls (the Goal clause, which is different for each
+# outcome) are guarded by a selector variable s: each clause C is loaded as (-s OR C),
+# and it is activated by solving under the assumption s.
+#
+# The solver is MiniSat, through the python bindings shipped with the gMUS extractor
+# (run `make -C gMUS/pyminisolvers` to compile them): it keeps its learned clauses
+# between calls. If the library is not compiled, we fall back to pylgl, which solves
+# every call from scratch (but, at least, without copying the formula).
+#
+# With a budget (a Budget), it is checked before each call: solve raises BudgetExhausted
+# instead of starting a call once the budget has run out.
+
+import os
+import pylgl
+from Helpers import GMUS_FOLDER, gMUS_importable
+
+gMUS_importable()
+
+# is the MiniSat library available?
+HAS_MINISAT = os.path.exists(os.path.join(GMUS_FOLDER, 'pyminisolvers', 'libminisat.so'))
+
+if HAS_MINISAT:
+    from pyminisolvers import minisolvers
+
+class SATSolver():
+
+    # budget: a Budget, checked before each call. None ---> no limit
+    def __init__(self, budget = None):
+
+        self.budget = budget
+
+        if HAS_MINISAT:
+            self._solver = minisolvers.MinisatSolver()
+        else:
+            # pylgl is not incremental: we just keep all the clauses here
+            self._solver = None
+            self._clauses = []
+
+        # true variables of the last model found by pylgl
+        self._model = set()
+
+        # number of clauses of the ClauseSink that have already been loaded
+        self._loaded = 0
+        # selector variables whose guarded clauses have already been loaded
+        self._selectors = set()
+
+    # load a list of clauses (a clause is a list, or tuple, of non-zero ints)
+    def addClauses(self, clauses):
+        if self._solver is None:
+            self._clauses += clauses
+        else:
+            # MiniSat wants the variables to be created before they are used
+            top = max((abs(literal) for clause in clauses for literal in clause), default = 0)
+            while self._solver.nvars() < top:
+                self._solver.new_var()
+
+            for clause in clauses:
+                self._solver.add_clause(clause)
+
+    # load the clauses of a ClauseSink that are not loaded yet (the sink only grows)
+    def addSink(self, sink):
+        if self._solver is None:
+            self._clauses.extend(sink.iterClauses(self._loaded))
+        else:
+            # all the variables of the sink are numbered by its SATEncoding
+            while self._solver.nvars() < sink.SAT.nbVariables:
+                self._solver.new_var()
+
+            # clauses come as array('i'), which the solver takes without converting them
+            for clause in sink.iterClauses(self._loaded):
+                self._solver.add_clause(clause)
+
+        self._loaded = sink.nbClauses()
+
+    # load clauses guarded by the selector variable (only once), and
+    # return the selector: pass it as an assumption to switch the clauses on.
+    def addGuarded(self, selector, clauses):
+        if selector not in self._selectors:
+            self._selectors.add(selector)
+            self.addClauses([[-selector, *clause] for clause in clauses])
+
+        return selector
+
+    # is the formula satisfiable under these assumptions (list of literals)?
+    def solve(self, assumptions = ()):
+        if self.budget is not None:
+            self.budget.check()
+
+        if self._solver is None:
+            # assumptions as unit clauses, removed right after the call
+            units = [[literal] for literal in assumptions]
+            self._clauses += units
+            try:
+                model = pylgl.solve(self._clauses)
+                if model == 'UNSAT':
+                    return False
+                self._model = {literal for literal in model if literal > 0}
+                return True
+            finally:
+                del self._clauses[len(self._clauses) - len(units):]
+        else:
+            top = max((abs(literal) for literal in assumptions), default = 0)
+            while self._solver.nvars() < top:
+                self._solver.new_var()
+
+            return self._solver.solve(list(assumptions))
+
+    # truth values of the variables in the model found by the last call to solve (if satisfiable)
+    def modelValues(self, variables):
+        if self._solver is None:
+            return [variable in self._model for variable in variables]
+        else:
+            return [self._solver.model_value(variable) == 1 for variable in variables]
@@ -0,0 +1,155 @@
+# Batch justification: justify many profiles with a pool of worker processes,
+# so that the start-up cost (interpreter, scipy, SAT solvers...) is paid once per worker,
+# and not once per profile. Results are streamed as soon as each profile is done.
+
+import json
+import multiprocessing
+import signal
+from contextlib import contextmanager
+from Profile import Profile
+from core import iterjustify, getOutcomesToCheck
+from InstanceCache import InstanceCache
+from Budget import Budget
+from AxiomStats import AxiomStats
+from Frontier import BestFirst
+
+# settings of the worker processes (set by the pool initializer)
+_settings = {}
+
+class JobTimeout(Exception):
+    pass
+
+# read jobs from a text file: one profile per line, in the syntax of Profile.fromString,
+# optionally followed by an outcome (after a space). E.g. "2:012,1:210 01".
+# Empty lines and lines starting with # are skipped.
+def readJobs(file):
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            parts = line.split()
+            yield parts[0] if len(parts) == 1 else (parts[0], parts[1])
+
+# a job is a profile string, or a pair (profile string, outcome string)
+def _parseJob(job):
+    if isinstance(job, str):
+        return job, None
+    else:
+        profile, outcome = job
+        return profile, outcome
+
+# raise JobTimeout if the body takes longer than seconds (None ---> no limit).
+# Note: the alarm can only interrupt Python code, so a long call into a SAT solver
+# is interrupted only once it returns.
+@contextmanager
+def _timeout(seconds):
+    if seconds is None:
+        yield
+        return
+
+    def handler(signum, frame):
+        raise JobTimeout()
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _initWorker(settings):
+    _settings.update(settings)
+
+    # each worker has its own connection to the cache
+    if settings['cache'] is not None:
+        cache = InstanceCache(settings['cache'], settings['cache_size'])
+        _settings['cache'] = cache
+
+# justify one profile (in a worker). Returns a JSON-serialisable record.
+def _justify(indexed_job):
+    index, job = indexed_job
+    string, outcome = _parseJob(job)
+
+    record = {'index': index, 'profile': string, 'outcome': outcome}
+
+    try:
+        with _timeout(_settings['timeout']):
+            goal_profile = Profile.fromString(string)
+            goal_outcome = None if outcome is None else set(map(int, outcome))
+            outcomesToCheck = getOutcomesToCheck(goal_profile, goal_outcome)
+
+            # a fresh budget, frontier and counters for each profile
+            budget = None if _settings['budget'] is None else Budget(**_settings['budget'])
+            strategy = BestFirst(goal_profile, _settings['axioms_to_use']) if _settings['strategy'] == 'best' else None
+            stats = AxiomStats() if _settings['profile_axioms'] else None
+
+            answers, depth, gen_time, sol_time = iterjustify(goal_profile, outcomesToCheck, _settings['axioms_to_use'], \
+                _settings['max_depth'], verbose = False, limit = _settings['limit'], inprocess = _settings['inprocess'], \
+                cache = _settings['cache'], quotient = _settings['quotient'], stats = stats, checkpoint = _settings['checkpoint'], \
+                smallest = _settings['smallest'], smallest_timeout = _settings['smallest_timeout'], budget = budget, strategy = strategy)
+
+        if budget is not None and budget.exhausted is not None:
+            # what we have so far (maybe some answers)
+            record['status'] = 'budget'
+            record['budget'] = budget.report()
+        else:
+            record['status'] = 'ok'
+        record['answers'] = [{'outcome': sorted(outcome), 'normative': sorted(normative), 'size': size, 'explanation': answer} \
+            for answer, normative, outcome, size in sorted(answers, key = lambda a: sorted(a[2]))]
+        record['depth'] = depth
+        record['gen_time'] = gen_time
+        record['sol_time'] = sol_time
+        if stats is not None:
+            record['axioms'] = stats.report()
+
+    except JobTimeout:
+        record['status'] = 'timeout'
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = repr(e)
+
+    # the pool terminates the workers at the end: write what we stored now
+    if _settings['cache'] is not None:
+        _settings['cache'].flush()
+
+    return record
+
+def justifyBatch(jobs, axioms_to_use, max_depth = None, limit = 1, processes = None, timeout = None, cache = None, cache_size = None, \
+    quotient = False, budget = None, inprocess = True, checkpoint = None, smallest = False, smallest_timeout = None, strategy = 'bfs', \
+    profile_axioms = False):
+    """ Justify many profiles in parallel. Inputs:
+    jobs: iterable of profile strings (syntax of Profile.fromString), or of pairs (profile string, outcome string);
+    with no outcome, all the outcomes are tried (as in main.py).
+    axioms_to_use, max_depth, limit, quotient, inprocess, checkpoint, smallest, smallest_timeout: as in iterjustify.
+    processes: number of worker processes (None ---> number of CPUs).
+    timeout: seconds allowed for each profile (None ---> no limit).
+    cache, cache_size: file and maximum size (bytes) of an InstanceCache shared by the workers (None ---> no cache).
+    budget: limits of a Budget for each profile, as a dict of its arguments, e.g. {'seconds': 60, 'memory': 2000}
+    (None ---> no limit). A profile whose budget runs out gets the status 'budget', with the report of the budget.
+    strategy: frontier policy of each graph, 'bfs' or 'best' (Frontier.BestFirst, built for each profile).
+    profile_axioms: count the work of each axiom, and add it to the records ('axioms', see AxiomStats.report).
+    The graphs are generated within the workers (iterjustify's processes is not available here).
+    Yields one record (a dict) per profile, as soon as it is done: the order is not preserved,
+    but each record contains the index of its job. """
+
+    settings = {'axioms_to_use': axioms_to_use, 'max_depth': max_depth, 'limit': limit, 'timeout': timeout, \
+        'cache': cache, 'cache_size': cache_size, 'quotient': quotient, 'budget': budget, 'inprocess': inprocess, \
+        'checkpoint': checkpoint, 'smallest': smallest, 'smallest_timeout': smallest_timeout, 'strategy': strategy, \
+        'profile_axioms': profile_axioms}
+
+    # fork: the workers must not re-import the main script (main.py is not import-safe)
+    context = multiprocessing.get_context('fork')
+    # a worker keeps (most of) the memory of its previous profiles: with a memory budget, one worker per profile
+    maxtasks = 1 if budget is not None and budget.get('memory') is not None else None
+    with context.Pool(processes, initializer = _initWorker, initargs = (settings,), maxtasksperchild = maxtasks) as pool:
+        for record in pool.imap_unordered(_justify, enumerate(jobs)):
+            yield record
+
+# run a batch and write the records to out, one JSON object per line
+def runBatch(jobs, out, axioms_to_use, max_depth = None, limit = 1, processes = None, timeout = None, cache = None, cache_size = None, \
+    quotient = False, budget = None, inprocess = True, checkpoint = None, smallest = False, smallest_timeout = None, strategy = 'bfs', \
+    profile_axioms = False):
+    for record in justifyBatch(jobs, axioms_to_use, max_depth, limit, processes, timeout, cache, cache_size, quotient, budget, \
+        inprocess, checkpoint, smallest, smallest_timeout, strategy, profile_axioms):
+        out.write(json.dumps(record) + '\n')
+        out.flush()
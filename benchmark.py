@@ -0,0 +1,327 @@
+# Microbenchmarks of the hot paths of the justification: profile predicates, generation of the
+# instances of each axiom, their SAT encoding, generation of the instance graph (depth by depth)
+# and writing the group CNF. The profiles come from fixed seeds (random generators and Preflib
+# samples), so that two runs measure the same work: compare them with --compare.
+#
+#   python benchmark.py --out results.json
+#   python benchmark.py --out new.json --compare results.json
+#
+# Prints, for each benchmark, the number of operations (e.g. profiles checked, instances encoded),
+# the best time over the repetitions, the operations per second, and the peak memory allocated
+# (measured by tracemalloc, in a separate run). Results are also written as JSON, with --out.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+from Profile import Profile
+from Preflib.readSoc import readPreflibString
+from GraphGen import GraphGen
+from SATEncoding import SATEncoding
+from ClauseSink import ClauseSink
+from Axioms.IntraAxioms.Goal import Goal
+from Axioms.Utils.axiomIterator import intraAxioms_set, interAxioms_set, derived_axiom_set
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+PREFLIB_FOLDER = os.path.join(FOLDER, 'Preflib')
+
+# number of profiles of each suite (see profileSuites)
+SUITE_SIZE = 20
+
+# all the axioms, by name (Goal instances are built by hand, not generated)
+AXIOMS = sorted(intraAxioms_set | interAxioms_set | derived_axiom_set, key = lambda a: a.axiomName())
+
+# A benchmark is a name, a setup function and a body function. The setup prepares what the body
+# needs (untimed); the body does the work, and returns the number of operations it did.
+class Benchmark():
+
+    def __init__(self, name, setup, body):
+        self.name = name
+        self.setup = setup
+        self.body = body
+
+    # best time over repeat runs, and number of operations
+    def time(self, repeat):
+        best = None
+        for _ in range(repeat):
+            state = self.setup()
+            start = perf_counter()
+            ops = self.body(state)
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return ops, best
+
+    # peak memory allocated by the body, in bytes
+    def memory(self):
+        state = self.setup()
+        tracemalloc.start()
+        try:
+            self.body(state)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+## profiles
+
+def profileSuites(seed):
+    """ Fixed sets of profiles to benchmark on: suite name ---> list of profiles. """
+
+    suites = {}
+    for gen in ('polya', 'walsh'):
+        # not many voters: the instances of Reinforcement grow exponentially with them
+        for n, m in ((5, 3), (8, 4)):
+            random.seed(seed)
+            if gen == 'polya':
+                profiles = [Profile.polyaUrn(n, m, 0) for _ in range(SUITE_SIZE)]
+            else:
+                profiles = [Profile.walshSinglePeaked(n, m) for _ in range(SUITE_SIZE)]
+            suites[f'{gen}-n{n}-m{m}'] = profiles
+
+    # samples of the Preflib files
+    for m in (3, 4):
+        folder = os.path.join(PREFLIB_FOLDER, f'{m}alts')
+        random.seed(seed)
+        profiles = []
+        for file in sorted(os.listdir(folder)):
+            if file.endswith('.soc'):
+                profiles.append(Profile.fromString(readPreflibString(os.path.join(folder, file), 8, m)))
+        suites[f'preflib-n8-m{m}'] = profiles[:SUITE_SIZE]
+
+    # the random profiles are almost never symmetric, or a shift away from a cancellation profile:
+    # Symmetry and QuasiTied* need these to have any instance
+    for m in (3, 4):
+        random.seed(seed)
+        suites[f'symmetric-m{m}'] = [symmetric(m) for _ in range(SUITE_SIZE)]
+        suites[f'quasitied-m{m}'] = [shifted(profile) for profile in suites[f'symmetric-m{m}']]
+
+    return suites
+
+# a random symmetric cancellation profile: the cyclic ballots over the alternatives (in a random
+# order) and their reverses
+def symmetric(m):
+    alternatives = list(range(m))
+    random.shuffle(alternatives)
+    cyclic = [tuple(alternatives[i:] + alternatives[:i]) for i in range(m)]
+    return Profile(cyclic + [ballot[::-1] for ballot in cyclic])
+
+# the profile with an alternative swapped with the next one in one (random) ballot
+def shifted(profile):
+    ballots = list(profile.allBallots())
+    j, i = random.randrange(len(ballots)), random.randrange(len(ballots[0]) - 1)
+    swapped = list(ballots[j])
+    swapped[i], swapped[i+1] = swapped[i+1], swapped[i]
+    ballots[j] = tuple(swapped)
+    return Profile(ballots)
+
+# a copy of the profiles, without anything computed yet (e.g. the pairwise supports)
+def fresh(profiles):
+    return [Profile(dict(profile.getTuples())) for profile in profiles]
+
+# goal profiles of the graph benchmarks (small: the graph grows fast with depth)
+GRAPH_GOALS = ['2:012,1:210,1:120,102,021', '0123,1032,2301,3210,0213']
+
+def getCorpus():
+    with open(os.path.join(FOLDER, 'corpus.txt')) as file:
+        return [line.strip() for line in file if line.strip()]
+
+## benchmarks
+
+def predicateBenchmarks(suites):
+
+    # predicate name ---> function checking it on all the profiles, returning how many checks
+    def condorcet(profiles):
+        for profile in profiles:
+            profile.getCondorcet()
+        return len(profiles)
+
+    def cancellation(profiles):
+        for profile in profiles:
+            profile.isCancellation()
+        return len(profiles)
+
+    def pareto(profiles):
+        checks = 0
+        for profile in profiles:
+            for x in profile.getAlternatives():
+                profile.isPareto(x)
+                checks += 1
+        return checks
+
+    def singlePeaked(profiles):
+        for profile in profiles:
+            profile.isSinglePeaked()
+        return len(profiles)
+
+    predicates = {'getCondorcet': condorcet, 'isCancellation': cancellation, 'isPareto': pareto, 'isSinglePeaked': singlePeaked}
+
+    for suite, profiles in suites.items():
+        for name, predicate in predicates.items():
+            yield Benchmark(f'profile/{name}/{suite}', lambda profiles = profiles: fresh(profiles), predicate)
+
+def axiomBenchmarks(suites):
+
+    # instances of an axiom for a profile, with the profile as goal (so reached by Goal, as in GraphGen:
+    # some axioms, e.g. QuasiTiedLosers, only search profiles reached by Goal or Reinforcement)
+    def generate(axiom, profile):
+        if axiom.isInter():
+            return [inst for _, inst in axiom.getInstancesAndProfiles(profile, profile, {Goal})]
+        elif axiom in derived_axiom_set:
+            return axiom.getInstancesAndProfiles(profile, profile, {Goal})
+        else:
+            return axiom.getInstances(profile, profile, {Goal})
+
+    for suite, profiles in suites.items():
+        for axiom in AXIOMS:
+
+            def body(profiles, axiom = axiom):
+                for profile in profiles:
+                    generate(axiom, profile)
+                return len(profiles)
+
+            yield Benchmark(f'axiom/{axiom.axiomName()}/{suite}', lambda profiles = profiles: fresh(profiles), body)
+
+            # encoding: the instances (and the variables of their profiles) are ready beforehand
+            def setup(profiles = profiles, axiom = axiom):
+                instances = [inst for profile in fresh(profiles) for inst in generate(axiom, profile)]
+                SAT = SATEncoding([], profiles[0].getAlternatives())
+                SAT.addProfiles({p for inst in instances for p in inst.getProfiles()})
+                return SAT, instances
+
+            def encode(state):
+                SAT, instances = state
+                for inst in instances:
+                    inst._computeSAT(SAT)
+                return len(instances)
+
+            # nothing to measure (e.g. no symmetric profile in the suite, for Symmetry)
+            if setup()[1]:
+                yield Benchmark(f'sat/{axiom.axiomName()}/{suite}', setup, encode)
+
+def graphBenchmarks(depth):
+
+    for goal in GRAPH_GOALS:
+        for d in range(depth+1):
+
+            # the graph up to depth d-1, to be expanded to depth d
+            def setup(goal = goal, d = d):
+                profile = Profile.fromString(goal)
+                SAT = SATEncoding([], profile.getAlternatives())
+                graph = GraphGen(profile, getCorpus(), sink = ClauseSink(SAT))
+                for k in range(d):
+                    graph.expand(k)
+                return graph
+
+            # operations: new instances
+            def body(graph, d = d):
+                before = len(graph.I)
+                graph.expand(d)
+                return len(graph.I) - before
+
+            yield Benchmark(f'graph/depth{d}/{goal}', setup, body)
+
+def dumpBenchmarks(depth):
+
+    for goal in GRAPH_GOALS:
+        for extension in ('gcnf', 'gcnf.gz'):
+
+            def setup(goal = goal):
+                profile = Profile.fromString(goal)
+                SAT = SATEncoding([], profile.getAlternatives())
+                sink = ClauseSink(SAT)
+                graph = GraphGen(profile, getCorpus(), sink = sink)
+                graph.expand(depth)
+                goal_clauses = graph.goal_instance.getInstanceSAT(SAT, {0})
+                return SAT, sink, goal_clauses
+
+            # operations: clauses written
+            def body(state, extension = extension):
+                SAT, sink, goal_clauses = state
+                with tempfile.TemporaryDirectory(prefix = 'benchmark-') as folder:
+                    SAT._dumpGroupCNF(sink, goal_clauses, os.path.join(folder, 'dump.' + extension))
+                return sink.nbClauses() + len(goal_clauses)
+
+            yield Benchmark(f'dump/{extension}/depth{depth}/{goal}', setup, body)
+
+## main
+
+def compare(results, previous, tolerance):
+    """ Print the change of ops/sec of each benchmark from the previous results.
+    Returns the names of the benchmarks slower by more than tolerance (a fraction). """
+
+    before = {result['name']: result for result in previous['results']}
+    regressions = []
+    for result in results:
+        if result['name'] in before and before[result['name']]['ops_per_sec']:
+            ratio = result['ops_per_sec'] / before[result['name']]['ops_per_sec']
+            flag = ''
+            if ratio < 1 - tolerance:
+                regressions.append(result['name'])
+                flag = '  <--- REGRESSION'
+            print(f"{result['name']:<60} {ratio:7.2f}x{flag}")
+
+    return regressions
+
+if __name__ == '__main__':
+
+    # the instance graph depends on the iteration order of sets, hence on the hash seed of python:
+    # we fix it too (by restarting the interpreter, the only way to set it)
+    if os.environ.get('PYTHONHASHSEED') != '0':
+        os.environ['PYTHONHASHSEED'] = '0'
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    parser = argparse.ArgumentParser(description = 'Microbenchmarks of the justification hot paths.')
+    parser.add_argument('--out', type=str, help='Write the results to this JSON file. Default: only print them', default = None)
+    parser.add_argument('--seed', type=int, help='Seed of the random profiles (and Preflib samples). Default: 0', default = 0)
+    parser.add_argument('--repeat', type=int, help='Repetitions of each benchmark (the best time is kept). Default: 3', default = 3)
+    parser.add_argument('--depth', type=int, help='Maximum depth of the graph benchmarks. Default: 2', default = 2)
+    parser.add_argument('--only', type=str, help='Only run the benchmarks whose name starts with one of these (comma-separated), e.g. profile,sat', default = None)
+    parser.add_argument('--no_memory', action='store_true', help='Do not measure memory (saves a run of each benchmark).')
+    parser.add_argument('--compare', type=str, help='Compare to the results in this JSON file, and exit with status 1 if some benchmark got slower.', default = None)
+    parser.add_argument('--tolerance', type=float, help='When comparing: slowdown allowed before reporting a regression. Default: 0.2 (20%%)', default = 0.2)
+    args = parser.parse_args()
+
+    suites = profileSuites(args.seed)
+    benchmarks = [*predicateBenchmarks(suites), *axiomBenchmarks(suites), *graphBenchmarks(args.depth), *dumpBenchmarks(args.depth)]
+    if args.only is not None:
+        prefixes = tuple(args.only.split(','))
+        benchmarks = [benchmark for benchmark in benchmarks if benchmark.name.startswith(prefixes)]
+
+    results = []
+    print(f"{'benchmark':<60} {'ops':>9} {'seconds':>9} {'ops/sec':>11} {'peak KiB':>9}")
+    for benchmark in benchmarks:
+        ops, seconds = benchmark.time(args.repeat)
+        peak = None if args.no_memory else benchmark.memory()
+
+        result = {'name': benchmark.name, 'ops': ops, 'seconds': seconds, \
+            'ops_per_sec': ops / seconds if seconds > 0 else None, 'peak_bytes': peak}
+        results.append(result)
+
+        rate = '-' if result['ops_per_sec'] is None else f"{result['ops_per_sec']:.0f}"
+        memory = '-' if peak is None else f'{peak // 1024}'
+        print(f'{benchmark.name:<60} {ops:>9} {seconds:>9.4f} {rate:>11} {memory:>9}', flush = True)
+
+    report = {
+        'date': datetime.now().isoformat(timespec = 'seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'seed': args.seed, 'repeat': args.repeat, 'depth': args.depth},
+        'results': results,
+    }
+    if args.out is not None:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent = 1)
+
+    if args.compare is not None:
+        print()
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than before.")
+            sys.exit(1)
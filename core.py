@@ -1,87 +1,182 @@
 # This file contains the main "engine" of the code.
 
 from SATEncoding import SATEncoding
-import pylgl
+from ClauseSink import ClauseSink
+from SATSolver import SATSolver
 from GraphGen import GraphGen
+from Budget import BudgetExhausted
+from Helpers import powerset
 from time import time
 
-def getSATFromInstances(instances, profiles, alternatives):
+def getOutcomesToCheck(goal_profile, goal_outcome = None):
+    """ Outcomes to try to justify for the goal profile: either the given one (a set of alternatives),
+    or all the non empty outcomes if it is None. Returns a set of frozensets. """
+
+    if goal_outcome is not None:
+        return {frozenset(goal_outcome)}
+
+    # we try all non empty outcomes. To get the alternatives, we look at the goal profile
+    outcomesToCheck = set()
+    for o in powerset(goal_profile.getAlternatives()):
+        if o:
+            outcomesToCheck.add(frozenset(o))
+
+    return outcomesToCheck
+
+def getSATFromInstances(instances, profiles, alternatives, SAT = None, quotient = False):
     """ instances is a set of objects of type Instance. Similarly for profiles.
     alternatives is a set of alternatives.
-    Returns a SATEncoding object, capable of handling various SAT-related tasks.
-    Returns also a dictionary to map from an instance (abstract object) to the
-    corresponding clauses (concrete encoding)."""
+    SAT is an optional SATEncoding object from a previous (smaller) graph: if given,
+    it is extended with the new profiles instead of being created from scratch.
+    quotient: profiles are representatives up to neutrality (see GraphGen).
+    Returns a ClauseSink, with the SAT encoding of the instances (one group of clauses
+    per instance), and the SATEncoding object, capable of handling various SAT-related tasks.
+    (iterjustify does not go through here: the graph encodes its instances as it generates them)"""
 
     # Returns the SAT-encoding object. This method accepts the set of profiles and the alternatives, and
     # returns an object capable of handling various SAT related tasks. When created, this object
     # contains a mapping from (profile, alternative) to propositional_variable.
-    SAT = SATEncoding(profiles, alternatives)
-
-    # init data structures
-    instance2clauses = {}
-    explanations = {}
+    if SAT is None:
+        SAT = SATEncoding(profiles, alternatives, quotient)
+    else:
+        SAT.addProfiles(profiles)
 
-    # for every instance that is not the goal, 
-    # obtain the SAT encoding for the instance, and link
-    # it to this instance in the mapping. Note that we need to pass
-    # the SAT object, as instances need to know the propositional variable
+    # for every instance, obtain the SAT encoding, as a group of clauses of the sink. Note that
+    # we need to pass the SAT object, as instances need to know the propositional variable
     # corresponding to each (profile, alternative) to make the mapping.
-    # The mapping serves to remember, for each clause, the corresponding instance
-    for instance in instances:
-        if instance.axiomName() != 'Goal':
-            instance2clauses[instance] = instance.getInstanceSAT(SAT)
-        else:
-            # we do not add the goal profile for now; it will be added later on by itself.
-            instance2clauses[instance] = []
-
-    return instance2clauses, SAT
-
-def createSAT(goal_profile, axioms_to_use, depth):
-    """ Create SAT encoding of the problem. Needs the goal profile, the axioms to use and the maximum depth."""
-    # Get the instance graph: instances and profiles.
-    instances, profiles = GraphGen(goal_profile, axioms_to_use, depth)
-    # encode the instances as SAT.
-    instance2clauses, SAT = getSATFromInstances(instances, profiles, goal_profile.getAlternatives())
-    # return the mapping instance->clauses, the SAT object, and some data about the length (used to check for fixed point)
-    return instance2clauses, SAT, len(instances), len(profiles)
-
-def solveSAT(SAT, outcomesToCheck, instance2clauses, depth, limit):
+    # The goal instance gets no clauses for now; they will be added later on by themselves.
+    sink = ClauseSink(SAT)
+    sink.update(instances)
+
+    return sink, SAT
+
+def createSAT(graph, depth, checkpoint = None, every = None):
+    """ Create SAT encoding of the problem. Needs the instance graph generator (GraphGen object),
+    with a ClauseSink, and the maximum depth. checkpoint and every are passed to graph.expand:
+    a checkpoint can stop the generation early (then, graph.stopped is True)."""
+    # Get the instance graph: instances and profiles. The graph only
+    # grows from the depth it already reached, and the new instances are encoded on the way
+    sink, profiles = graph.expand(depth, checkpoint, every)
+    # return the encoded instances, and some data about the length (used to check for fixed point)
+    return sink, len(sink), len(profiles)
+
+def getConsistentOutcomes(SAT, sink, solver, limit = None):
+    """ Outcomes of the goal profile that the instances of the sink allow, i.e. the models of the
+    instances projected on the variables of the goal profile. One SAT call per outcome found (plus
+    one): each model found is blocked for the next call. Inputs:
+    SAT, sink: as in solveSAT. solver: SATSolver session, with the clauses of the sink loaded.
+    limit: stop after this many outcomes (None ---> all of them).
+    Returns a set of frozensets (possibly including the empty outcome, if the corpus allows it). """
+
+    goal_profile = next(iter(sink.records[sink.goalID].getProfiles()))
+    literals = [(x, SAT.getLiteral(goal_profile, x)) for x in goal_profile.getAlternatives()]
+
+    # the blocking clauses are guarded by a fresh selector: they only hold during this enumeration
+    selector = SAT.newVariable()
+
+    outcomes = set()
+    while limit is None or len(outcomes) < limit:
+        if not solver.solve([selector]):
+            break
+        values = solver.modelValues([literal for _, literal in literals])
+        outcome = frozenset(x for (x, _), value in zip(literals, values) if value)
+        outcomes.add(outcome)
+        # next time, the goal profile must have another outcome
+        solver.addClauses([[-selector] + [-literal if x in outcome else literal for x, literal in literals]])
+
+    # switch the blocking clauses off for good
+    solver.addClauses([[-selector]])
+
+    return outcomes
+
+def getProvableOutcomes(SAT, outcomesToCheck, sink, solver):
+    """ Outcomes (among outcomesToCheck) that have a proof from the instances of the sink, i.e. whose
+    goal clause is unsatisfiable with them. The clauses of the sink are loaded in the solver.
+    The goal clause of an outcome says the goal profile gets another outcome: it is unsatisfiable iff
+    every model gives that outcome. So, instead of one SAT call per outcome, we enumerate the outcomes
+    the instances allow, and stop at the second one (at most three calls): if there is one, it is the
+    only provable outcome; if there are two or more, there is none; if there are none (the instances
+    are inconsistent), every outcome is. Returns a set of frozensets. """
+
+    solver.addSink(sink)
+
+    # a single outcome: just check it (one call)
+    if len(outcomesToCheck) <= 1:
+        goal_instance = sink.records[sink.goalID]
+        provable = set()
+        for goal_outcome in outcomesToCheck:
+            # the goal clause is loaded guarded by a selector, which switches it on only for this call.
+            selector = solver.addGuarded(SAT.getSelector(goal_outcome), goal_instance.getInstanceSAT(SAT, goal_outcome))
+            if not solver.solve([selector]):
+                provable.add(goal_outcome)
+        return provable
+
+    consistent = getConsistentOutcomes(SAT, sink, solver, limit = 2)
+    if not consistent:
+        return set(outcomesToCheck)
+    if len(consistent) == 1:
+        return consistent & set(outcomesToCheck)
+    return set()
+
+def solveSAT(SAT, outcomesToCheck, sink, depth, limit, solver = None, inprocess = True, verbose = True, smallest = False, smallest_timeout = None, \
+    budget = None):
 
     """ Find gMUSes of the SAT encoding. Inputs:
     SAT is an object capable of handling various SAT-related tasks.
     outcomesToCheck: set of sets of alterantives. This are the outcomes we try to justify.
-    instance2clauses. Mapping from Instance object to its SAT encoding.
+    sink. ClauseSink with the SAT encoding of the instances.
     depth. Maximum depth we're looking for. Here just for printing purposes.
-    limit. Number of gMUSes to generate. """
+    limit. Number of gMUSes to generate.
+    solver. Incremental SATSolver session (e.g. the one of the previous depth): only the clauses
+    it does not have yet are loaded. If None, a new session is used for all the outcomes.
+    inprocess. Extract the gMUSes in-process (otherwise, run the gMUS extractor in a subprocess).
+    verbose. Print stuff or not.
+    smallest. Find a gMUS of minimum size (instead of the smallest of limit gMUSes).
+    smallest_timeout. Seconds allowed to prove it minimum: then, keep the smallest one found so far.
+    budget. Budget of the justification: once it runs out, no more gMUSes are extracted, but the
+    justifications found so far are returned. Checking the outcomes raises BudgetExhausted, if it already has. """
 
     # init structure
     answers = set()
-    cnf = []
 
-    # we turn this to a huge cnf formula!
-    # loop over all instances. For the goal instance,
-    # we keep it apart (we add it later)
-    for inst, clauses in instance2clauses.items():
-        if inst.axiomName() == 'Goal':
-            goal_instance = inst
-        else:
-            cnf += clauses
+    if solver is None:
+        solver = SATSolver()
+
+    # we load the instances in the solver (once!), and find the outcomes with a proof
+    # The goal instance has no clauses in the sink: it depends on the outcome
+    provable = getProvableOutcomes(SAT, outcomesToCheck, sink, solver)
+    goal_instance = sink.records[sink.goalID]
+
+    # the other outcomes have no proof at this depth
+    if budget is not None:
+        budget.note(solved_depth = depth, satisfiable = sorted(sorted(o) for o in outcomesToCheck if o not in provable))
 
     # for every outcome to check...
     for goal_outcome in outcomesToCheck:
-        # add goal clause FOR THIS PARTICULAR OUTCOME.
+        # goal clause FOR THIS PARTICULAR OUTCOME.
         goal_clauses = goal_instance.getInstanceSAT(SAT, goal_outcome)
-        cnf_with_goal = cnf + goal_clauses
-        # set it in the mapping as well.
-        instance2clauses[goal_instance] = goal_clauses
 
         # if this set is unsolvable, we might find some justifications, otherwise no.
-        if pylgl.solve(cnf_with_goal) == 'UNSAT':
+        if goal_outcome in provable:
+
+            if budget is not None and budget.exceeded() is not None:
+                break
+
+            if verbose:
+                print(f" A proof for outcome {set(goal_outcome)} exists! Extracting...", flush = True)
 
-            print(f" A proof for outcome {set(goal_outcome)} exists! Extracting...", flush = True)
+            # bounds on the size of the smallest gMUS, as they improve
+            bounds = []
+            def onBound(lower, upper):
+                bounds.append((lower, upper))
+                if verbose:
+                    print(f"  size between {lower} and {upper}", flush = True)
 
             # try extract justification using the SAT object
-            normative, explanation = SAT.getJustification(instance2clauses, limit)
+            normative, explanation = SAT.getJustification(sink, goal_clauses, limit, inprocess, smallest, smallest_timeout, onBound, budget)
+
+            if verbose and smallest and bounds and bounds[-1][0] < bounds[-1][1]:
+                print(f"  out of time: the smallest explanation might be smaller (at least {bounds[-1][0]} instances)", flush = True)
 
             # if we found one: (might be none if normative is nontrivial)
             # make a nice message stating it
@@ -105,10 +200,27 @@ def solveSAT(SAT, outcomesToCheck, instance2clauses, depth, limit):
 
 # main wrapper of this method
 # needs: goal profile, outcomes we want to check, axioms to use, maximum depth, verbose (print stuff or not), limit (# of gMUSes to gen)
-def iterjustify(goal_profile, outcomesToCheck, axioms_to_use, MAX_DEPTH, verbose = True, limit = 1):
+# inprocess: extract gMUSes in-process (otherwise, with the gMUS extractor in a subprocess)
+# cache: InstanceCache to reuse generated instances. quotient: one profile per neutrality orbit (see GraphGen)
+# processes: number of worker processes generating the graph (None ---> no workers)
+# stats: an AxiomStats, filled with what each axiom did while generating the graph (read stats.report() afterwards)
+# checkpoint: interleave generation and solving. The outcomes are checked every `checkpoint` new profiles
+# (0 ---> at the end of each level), and a depth is generated only until some outcome has a proof. None ---> off
+# smallest: find a justification of minimum size (at its depth), giving up on proving it after smallest_timeout seconds
+# budget: a Budget (time, memory, size of the graph). When it runs out, we stop and return what we have (answers
+# found so far, if any): budget.report() then tells which limit ran out, the depth reached and the size of the
+# graph ('depth', 'instances', 'profiles'), the last depth solved and the outcomes known to have no proof there
+# ('solved_depth', 'satisfiable').
+# strategy: frontier policy of the graph (see Frontier.py), e.g. BestFirst: with checkpoints, the most promising
+# profiles of each level are explored first. None ---> BFS order
+def iterjustify(goal_profile, outcomesToCheck, axioms_to_use, MAX_DEPTH, verbose = True, limit = 1, inprocess = True, cache = None, quotient = False, \
+    processes = None, stats = None, checkpoint = None, smallest = False, smallest_timeout = None, budget = None, strategy = None):
 
     # init stuff
     outcome, normative, answer, size = None, None, None, None
+    answers, gen_time, sol_time = set(), 0, 0
+    if budget is not None:
+        budget.note(solved_depth = None, satisfiable = [])
 
     # we start from depth 0, and then iteratively increase.
     depth = 0
@@ -118,45 +230,81 @@ def iterjustify(goal_profile, outcomesToCheck, axioms_to_use, MAX_DEPTH, verbose
     # equalt to the current one, we quit.
     LAST_SEEN_INSTANCES, LAST_SEEN_PROFILES = -1, -1
 
-    # main loop
-    while True:
+    # the instance graph and its SAT encoding are grown depth by depth,
+    # so that we never regenerate what we already have (nor what previous runs stored in the cache, if any).
+    # Instances are encoded as soon as they are generated: the graph keeps them in the sink.
+    SAT = SATEncoding([], goal_profile.getAlternatives(), quotient)
+    sink = ClauseSink(SAT)
+    graph = GraphGen(goal_profile, axioms_to_use, cache, quotient, processes, sink, stats, budget, strategy)
+    # same for the SAT solver: clauses are only appended
+    solver = SATSolver(budget)
+
+    # in the interleaved mode, the solver gets the new clauses at each checkpoint, and we stop generating
+    # as soon as one of the pending outcomes is UNSAT (i.e., a proof exists: the graph only adds constraints).
+    pending = set(outcomesToCheck)
+    def isProved():
+        provable = getProvableOutcomes(SAT, pending, sink, solver)
+        # if these do not give a justification after all, do not stop for them again
+        pending.difference_update(provable)
+        return bool(provable)
+
+    # main loop (until a limit of the budget, if any, runs out)
+    try:
+        while True:
+
+            # if we are not out of max depth yet... (None ---> no bound)
+            if MAX_DEPTH is not None and depth > MAX_DEPTH:
+                break
 
-        # if we are not out of max depth yet... (None ---> no bound)
-        if MAX_DEPTH is not None and depth > MAX_DEPTH:
-            break
-
-        if verbose:
-            print(f"Generating code for depth {depth}...", end = ' ', flush = True)
-        start = time()
-        # create the SAT encoding up to depth depth
-        instance2clauses, SAT, seen_instances, seen_profiles = createSAT(goal_profile, axioms_to_use, depth)
-        gen_time = time() - start
-
-        # if we found a fixed point, exit
-        if LAST_SEEN_INSTANCES == seen_instances and LAST_SEEN_PROFILES == seen_profiles:
             if verbose:
-                print("Fixed point of instances found. Quitting...")
-            break
-
-        if verbose:            
-            print(f"Done: found {seen_instances} instances and {seen_profiles} profiles. Solving...", end = '', flush = True)
-        start = time()
-        # find justifications (or at least try)
-        answers = solveSAT(SAT, outcomesToCheck, instance2clauses, depth, limit)
-        sol_time = time() - start
+                print(f"Generating code for depth {depth}...", end = ' ', flush = True)
+            start = time()
+            # create the SAT encoding up to depth depth (or less, if a checkpoint finds a proof before)
+            if checkpoint is None:
+                sink, seen_instances, seen_profiles = createSAT(graph, depth)
+            else:
+                sink, seen_instances, seen_profiles = createSAT(graph, depth, isProved, checkpoint)
+            gen_time = time() - start
+
+            # if we found a fixed point, exit
+            if not graph.stopped and LAST_SEEN_INSTANCES == seen_instances and LAST_SEEN_PROFILES == seen_profiles:
+                if verbose:
+                    print("Fixed point of instances found. Quitting...")
+                break
 
-        # if we found some, we're done (we care about at least 1 justification)
-        if answers:
             if verbose:
-                print('\n')
-            break
-        else:
-            if verbose:
-                print(" No justification found.")
+                stopped = " (stopped early: a proof exists)" if graph.stopped else ""
+                print(f"Done: found {seen_instances} instances and {seen_profiles} profiles{stopped}. Solving...", end = '', flush = True)
+            start = time()
+            # find justifications (or at least try)
+            answers = solveSAT(SAT, outcomesToCheck, sink, depth, limit, solver, inprocess, verbose, smallest, smallest_timeout, budget)
+            sol_time = time() - start
+
+            # if we found some, we're done (we care about at least 1 justification)
+            if answers:
+                if verbose:
+                    print('\n')
+                break
+            else:
+                if verbose:
+                    print(" No justification found.")
+
+            # the generation of this depth stopped early, for nothing: finish it
+            if graph.stopped:
+                continue
+
+            # set this data, for check of fixed point in generation. Augment depth!
+            LAST_SEEN_INSTANCES, LAST_SEEN_PROFILES = seen_instances, seen_profiles
+            depth += 1
+    except BudgetExhausted:
+        if verbose:
+            print(f" Budget exhausted ({budget.exhausted}).")
+    finally:
+        # stop the workers, if any (also when something else interrupts us: a timeout, an error...)
+        graph.close()
 
-        # set this data, for check of fixed point in generation. Augment depth!
-        LAST_SEEN_INSTANCES, LAST_SEEN_PROFILES = seen_instances, seen_profiles
-        depth += 1
+    if budget is not None:
+        budget.note(depth = depth, instances = len(sink), profiles = len(graph.P))
 
     # return justifications, depth we got to, and time information
     return answers, depth, gen_time, sol_time
\ No newline at end of file
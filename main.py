@@ -1,10 +1,9 @@
 # Main interface
 
 import argparse
-from Helpers import powerset
 from time import time
 from Profile import Profile
-from core import iterjustify
+from core import iterjustify, getOutcomesToCheck
 from datetime import datetime
 
 parser = argparse.ArgumentParser()
@@ -22,10 +21,57 @@ parser.add_argument('--m', type=int, help='When generating a random profile, spe
 parser.add_argument('--preflib', action='store_true', help='Read from preflib profile. Specify --file, --n and --m!')
 parser.add_argument('--file', type=str, help='File to read for preflib. No `.soc`, please!')
 parser.add_argument('--draw', action='store_true', help='Draw answer.')
+parser.add_argument('--marco', action='store_true', help='Extract gMUSes by running the gMUS extractor (MARCO) in a subprocess, with 8 parallel enumerators. Default: in-process extraction.')
+parser.add_argument('--batch', type=str, help='Justify all the profiles in this file (one per line, optionally followed by an outcome, e.g. `2:012,1:210 01`) with a pool of processes. Prints one JSON record per profile.', default = None)
+parser.add_argument('--jobs', type=int, help='Batch mode: number of worker processes. Default: number of CPUs.', default = None)
+parser.add_argument('--timeout', type=float, help='Batch mode: seconds allowed for each profile. Default: no limit.', default = None)
+parser.add_argument('--processes', type=int, help='Generate the instance graph with this many worker processes (each level of the graph is split among them). Default: no workers.', default = None)
+parser.add_argument('--profile_axioms', '--profile-axioms', action='store_true', help='Count the work of each axiom (calls, time, instances, duplicates, profiles reached), by depth, and print it at the end.')
+parser.add_argument('--checkpoint', type=int, help='Interleave generation and solving: check the outcomes every this many new profiles (0: at the end of each level), and stop generating as soon as a proof exists. Default: solve once each depth is generated.', default = None)
+parser.add_argument('--quotient', action='store_true', help='Explore one profile per neutrality orbit (Neutrality must be in the corpus). Much smaller graphs for many alternatives. Depths (and --max_depth) are counted in the quotient graph: not comparable with the default mode.')
+parser.add_argument('--cache', type=str, help='File of a persistent cache of axiom instances (created if needed), reused across runs. Default: no cache.', default = None)
+parser.add_argument('--cache_size', type=float, help='Maximum size of the cache, in MB (least recently used entries are evicted). Default: no bound.', default = None)
+parser.add_argument('--smallest', action='store_true', help='Find a justification of minimum size (proven minimum among the instances generated: with --checkpoint, the partial graph), instead of the smallest among --limit ones.')
+parser.add_argument('--smallest_timeout', type=float, help='With --smallest: seconds allowed to prove minimality, then keep the smallest justification found so far (proving it can take hours, even with 3 alternatives). Default: 60', default = 60)
+parser.add_argument('--time_budget', type=float, help='Stop after this many seconds, and report how far the justification got. Default: no limit.', default = None)
+parser.add_argument('--memory_budget', type=float, help='Stop once the resident memory of the process reaches this many MB. Default: no limit.', default = None)
+parser.add_argument('--max_instances', type=int, help='Stop once the instance graph has more instances than this. Default: no limit.', default = None)
+parser.add_argument('--max_profiles', type=int, help='Stop once the instance graph has more profiles than this. Default: no limit.', default = None)
+parser.add_argument('--strategy', type=str, choices=['bfs', 'best'], help='Order in which the profiles of each level of the graph are explored: bfs (as reached) or best (most promising first, see Frontier.BestFirst). With best, the outcomes are checked every 10 new profiles, unless --checkpoint says otherwise. Default: bfs', default = 'bfs')
 args = parser.parse_args()
 
 PREFLIB_FOLDER = '/Preflib'
 
+# read axioms to use
+with open(args.corpus, 'r') as f:
+    axioms_to_use = f.read().split('\n')
+
+cache_size = None if args.cache_size is None else int(args.cache_size * 2**20)
+
+# limits of the budget (see Budget)
+budget = {'seconds': args.time_budget, 'memory': args.memory_budget, 'instances': args.max_instances, 'profiles': args.max_profiles}
+budget = None if all(limit is None for limit in budget.values()) else budget
+
+# exploring the best profiles first only pays if we stop as soon as there is a proof
+checkpoint = args.checkpoint
+if args.strategy == 'best' and checkpoint is None:
+    checkpoint = 10
+
+# batch mode: justify every profile of the file, and print the results as they come
+if args.batch is not None:
+    import sys
+    from batch import readJobs, runBatch
+
+    # the workers of the batch can't have worker processes of their own
+    if args.processes is not None:
+        parser.error('--processes cannot be used with --batch (the profiles are already justified in parallel, see --jobs)')
+
+    with open(args.batch, 'r') as f:
+        runBatch(readJobs(f), sys.stdout, axioms_to_use, args.max_depth, args.limit, args.jobs, args.timeout, args.cache, cache_size, args.quotient, budget, \
+            not args.marco, checkpoint, args.smallest, args.smallest_timeout, args.strategy, args.profile_axioms)
+
+    sys.exit(0)
+
 if args.random:
 
     assert args.o is None, "Can't specify outcome when dealing with random profiles."
@@ -73,24 +119,42 @@ else:
     # if none: we will try all
     goal_outcome = None if args.o is None else set(map(int, args.o))
 
-# read axioms to use
-with open(args.corpus, 'r') as f:
-    axioms_to_use = f.read().split('\n')
+# if none: we try all non empty outcomes
+outcomesToCheck = getOutcomesToCheck(goal_profile, goal_outcome)
 
-if goal_outcome is not None:
-    outcomesToCheck = {frozenset(goal_outcome)}
-else:
-    # we try all non empty outcomes. To get the alternatives, we look at the goal profile
-    outcomesToCheck = set()
-    for o in powerset(goal_profile.getAlternatives()):
-        if o:
-            outcomesToCheck.add(frozenset(o))
+# persistent cache of instances
+cache = None
+if args.cache is not None:
+    from InstanceCache import InstanceCache
+    cache = InstanceCache(args.cache, cache_size)
+
+# per-axiom counters
+stats = None
+if args.profile_axioms:
+    from AxiomStats import AxiomStats
+    stats = AxiomStats()
+
+# the clock of the budget starts now
+if budget is not None:
+    from Budget import Budget
+    budget = Budget(**budget)
+
+# frontier policy of the graph
+strategy = None
+if args.strategy == 'best':
+    from Frontier import BestFirst
+    strategy = BestFirst(goal_profile, axioms_to_use)
 
 start = time()
 
 # Try to find a justification! Returns the answers, depth of the found justification(s), generation and solving times
 # answers contains: a nice text for the explanation, normative basis, the justified outcome, and size.
-answers, depth, gen_time, sol_time = iterjustify(goal_profile, outcomesToCheck, axioms_to_use, args.max_depth, limit = args.limit)
+answers, depth, gen_time, sol_time = iterjustify(goal_profile, outcomesToCheck, axioms_to_use, args.max_depth, limit = args.limit, inprocess = not args.marco, cache = cache, \
+    quotient = args.quotient, processes = args.processes, stats = stats, checkpoint = checkpoint, \
+    smallest = args.smallest, smallest_timeout = args.smallest_timeout, budget = budget, strategy = strategy)
+
+if cache is not None:
+    cache.close()
 
 elapsed = time() - start
 
@@ -109,9 +173,20 @@ if answers:
 else:
     print("No justification.")
 
+if budget is not None and budget.exhausted is not None:
+    report = budget.report()
+    print(f"Budget exhausted ({report['exhausted']}) at depth {report['depth']}, with {report['instances']} instances and {report['profiles']} profiles.")
+    if report['solved_depth'] is not None:
+        print(f"At depth {report['solved_depth']}, no proof for: {', '.join(str(set(o)) for o in report['satisfiable'])}.")
+
 if args.time:
     print(f'elapsed time: {elapsed:.2f}')
 
+if stats is not None:
+    print()
+    print("Work of the axioms (time in seconds):")
+    print(stats.toString())
+
 # draw explanation
 if args.draw and answers:
     from drawGraph import drawGraph